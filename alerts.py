@@ -0,0 +1,471 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+
+from metrics import count, timer
+
+ALERTS_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'alerts.db')
+ALERTS_LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'alerts.jsonl')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS alert_rules (
+    id INTEGER PRIMARY KEY,
+    internal_pid INTEGER NOT NULL,
+    site_name TEXT,              -- NULL: any store
+    below INTEGER,               -- fire when cur_price < below
+    min_drop_per INTEGER,        -- fire when price_drop_per >= min_drop_per
+    target TEXT,                 -- who to notify (email, chat id, ...)
+    created_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS alert_rules_pid ON alert_rules (internal_pid);
+"""
+
+
+class AlertRules:
+    """
+    Watch rules stored in SQLite (WAL mode).
+    A rule watches one internalPid (optionally at one store) and fires when the
+    price goes below `below` rupees and/or the drop reaches `min_drop_per` percent.
+    """
+
+    def __init__(self, path=ALERTS_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(_SCHEMA)
+        self._changes = 0  # bumped on every change made through this connection
+
+    def close(self):
+        self.conn.close()
+
+    @property
+    def version(self):
+        """
+        Changes whenever the rules do, so indexes know to rebuild: ours are counted,
+        and PRAGMA data_version moves when another connection (`alerts.py add` in
+        another process) commits.
+        """
+        with self._lock:
+            return self._changes, self.conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def add(self, internal_pid, below=None, min_drop_per=None, site_name=None, target=None):
+        """Register one rule; returns its id."""
+        return self.add_many([(internal_pid, below, min_drop_per, site_name, target)])[0]
+
+    def add_many(self, rules):
+        """Bulk insert (internal_pid, below, min_drop_per, site_name, target) tuples; returns their ids."""
+        rows = []
+        now = int(time.time())
+        for pid, below, min_drop_per, site_name, target in rules:
+            if below is None and min_drop_per is None:
+                raise ValueError("A rule needs a price (below) or a drop percentage (min_drop_per)")
+            if min_drop_per is not None and not 1 <= int(min_drop_per) <= 100:
+                raise ValueError(f"min_drop_per must be 1-100, got {min_drop_per}")
+            rows.append((int(pid), site_name or None, None if below is None else int(below),
+                         None if min_drop_per is None else int(min_drop_per), target, now))
+        with self._lock, self.conn:
+            first = self.conn.execute('SELECT COALESCE(MAX(id), 0) FROM alert_rules').fetchone()[0] + 1
+            self.conn.executemany(
+                'INSERT INTO alert_rules (internal_pid, site_name, below, min_drop_per, target, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)', rows)
+            self._changes += 1
+        return list(range(first, first + len(rows)))
+
+    def remove(self, rule_id):
+        with self._lock, self.conn:
+            removed = self.conn.execute('DELETE FROM alert_rules WHERE id = ?', (int(rule_id),)).rowcount
+            self._changes += 1
+        return bool(removed)
+
+    def rules(self, internal_pid=None):
+        """[(id, internal_pid, site_name, below, min_drop_per, target)]"""
+        sql = 'SELECT id, internal_pid, site_name, below, min_drop_per, target FROM alert_rules'
+        if internal_pid is None:
+            return self.conn.execute(sql + ' ORDER BY id').fetchall()
+        return self.conn.execute(sql + ' WHERE internal_pid = ? ORDER BY id', (int(internal_pid),)).fetchall()
+
+    def targets(self, rule_ids):
+        """{rule_id: target} for the given ids, looked up in chunks."""
+        ids = [int(i) for i in rule_ids]
+        found = {}
+        for i in range(0, len(ids), 900):  # stay under SQLite's bound-parameter limit
+            chunk = ids[i:i + 900]
+            marks = ','.join('?' * len(chunk))
+            found.update(self.conn.execute(f'SELECT id, target FROM alert_rules WHERE id IN ({marks})', chunk))
+        return found
+
+    def columns(self):
+        """All rules as numpy columns (ids ascending), for building a RuleIndex."""
+        rows = self.conn.execute(
+            'SELECT id, internal_pid, site_name, COALESCE(below, -1), COALESCE(min_drop_per, -1) '
+            'FROM alert_rules ORDER BY id').fetchall()
+        if not rows:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64), [], np.zeros(0, np.int64), np.zeros(0, np.int64)
+        ids, pids, sites, below, drops = zip(*rows)
+        return (np.array(ids, np.int64), np.array(pids, np.int64), list(sites),
+                np.array(below, np.int64), np.array(drops, np.int64))
+
+
+class RuleIndex:
+    """
+    Rules sorted by (product, threshold), so a scrape is matched with binary searches
+    instead of rules x products comparisons.
+    - price rules are keyed (product code << 32 | below): for a listing at price p the
+      matching rules are one contiguous run, from the first key above (code, p) to
+      the end of the product's block
+    - drop rules are keyed (product code << 8 | min_drop_per): the matching run is the
+      start of the block up to (code, drop)
+    Lookups for a whole batch are a handful of np.searchsorted calls; the runs are
+    then expanded into (rule, listing) pairs.
+    """
+
+    def __init__(self, ids, pids, sites, below, drops):
+        self.ids = ids
+        self.pids = np.unique(pids)                   # product code = position in here
+        codes = np.searchsorted(self.pids, pids)
+        self.site_codes = {}                          # site name -> code (0 = any store)
+        site = np.fromiter((0 if s is None else self.site_codes.setdefault(s, len(self.site_codes) + 1)
+                            for s in sites), dtype=np.int32, count=len(ids))
+        self.site = site
+
+        has_below = np.flatnonzero(below >= 0)
+        keys = (codes[has_below] << 32) | below[has_below]
+        order = np.argsort(keys, kind='stable')
+        self.below_keys = keys[order]
+        self.below_rules = has_below[order]           # positions into ids / site
+        self.below = below
+
+        has_drop = np.flatnonzero(drops >= 0)
+        keys = (codes[has_drop] << 8) | drops[has_drop]
+        order = np.argsort(keys, kind='stable')
+        self.drop_keys = keys[order]
+        self.drop_rules = has_drop[order]
+        self.drops = drops
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def _expand(lo, hi):
+        # [lo0..hi0) + [lo1..hi1) + ... as one array, plus which range each came from
+        counts = hi - lo
+        counts[counts < 0] = 0
+        total = int(counts.sum())
+        which = np.repeat(np.arange(len(lo)), counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        return lo[which] + offsets, which
+
+    def match(self, pids, prices, drops, sites):
+        """
+        Match a batch of listings given as arrays (internalPid, cur_price,
+        price_drop_per, site code from site_code()). Returns (rule positions,
+        listing positions, kinds) with kind 0 = below price, 1 = drop %.
+        """
+        if not len(self.pids):
+            empty = np.zeros(0, np.int64)
+            return empty, empty, np.zeros(0, np.int8)
+        pos = np.minimum(np.searchsorted(self.pids, pids), len(self.pids) - 1)
+        known = np.flatnonzero(self.pids[pos] == pids)
+        codes = pos[known]
+
+        lo = np.searchsorted(self.below_keys, (codes << 32) | prices[known], side='right')
+        hi = np.searchsorted(self.below_keys, (codes + 1) << 32, side='left')
+        at, which = self._expand(lo, hi)
+        below_rules, below_listings = self.below_rules[at], known[which]
+
+        lo = np.searchsorted(self.drop_keys, codes << 8, side='left')
+        hi = np.searchsorted(self.drop_keys, (codes << 8) | np.clip(drops[known], 0, 255), side='right')
+        at, which = self._expand(lo, hi)
+        drop_rules, drop_listings = self.drop_rules[at], known[which]
+
+        rules = np.concatenate([below_rules, drop_rules])
+        listings = np.concatenate([below_listings, drop_listings])
+        kinds = np.concatenate([np.zeros(len(below_rules), np.int8), np.ones(len(drop_rules), np.int8)])
+        # Store-specific rules only fire for their store
+        rule_site = self.site[rules]
+        keep = (rule_site == 0) | (rule_site == sites[listings])
+        return rules[keep], listings[keep], kinds[keep]
+
+    def site_code(self, name):
+        return self.site_codes.get(name, -1)
+
+
+class AlertEngine:
+    """
+    Checks every scrape batch against all watch rules and sends what fires to the sinks.
+    - a rule fires at most once per price: it fires again only after the price changes
+    - the index is rebuilt lazily when rules were added or removed, by this
+      process or another one (checked once per batch)
+    - on_persist(delta, listings) plugs straight into ScrapeDaemon(on_persist=...),
+      so only added/changed listings are checked
+    Sinks are objects with send(alerts); see FileSink and WebhookSink.
+    """
+
+    def __init__(self, rules=None, sinks=None):
+        self.rules = rules if rules is not None else AlertRules()
+        self.sinks = list(sinks or [])
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+        self._last_fired = np.zeros(0, np.int64)  # per rule position: price it last fired at (-1: never)
+
+    def _get_index(self):
+        if self._index is None or self._version != self.rules.version:
+            version = self.rules.version
+            with timer('alerts_index'):
+                index = RuleIndex(*self.rules.columns())
+            last_fired = np.full(len(index), -1, np.int64)
+            if self._index is not None and len(self._index):
+                # Keep "already fired at this price" across rebuilds
+                old = np.searchsorted(self._index.ids, index.ids)
+                old[old >= len(self._index.ids)] = 0
+                same = self._index.ids[old] == index.ids
+                last_fired[same] = self._last_fired[old[same]]
+            self._index, self._last_fired, self._version = index, last_fired, version
+        return self._index
+
+    def evaluate(self, records, now=None):
+        """Match listings against all rules; returns the alerts sent to the sinks."""
+        with self._lock, timer('alerts'):
+            index = self._get_index()
+            records = [r for r in records if r.get('internalPid') is not None and r.get('cur_price') is not None]
+            if not records or not len(index):
+                return []
+            n = len(records)
+            pids = np.fromiter((int(r['internalPid']) for r in records), np.int64, n)
+            prices = np.fromiter((int(r['cur_price']) for r in records), np.int64, n)
+            drops = np.fromiter((_drop_per(r) for r in records), np.int64, n)
+            sites = np.fromiter((index.site_code(r.get('site_name')) for r in records), np.int32, n)
+
+            rules, listings, kinds = index.match(pids, prices, drops, sites)
+            # Once per rule per batch, and not again at the price it already fired at
+            rules, first = np.unique(rules, return_index=True)
+            listings, kinds = listings[first], kinds[first]
+            fresh = self._last_fired[rules] != prices[listings]
+            rules, listings, kinds = rules[fresh], listings[fresh], kinds[fresh]
+            self._last_fired[rules] = prices[listings]
+            if not len(rules):
+                return []
+
+            rule_ids = index.ids[rules]
+            targets = self.rules.targets(rule_ids.tolist())
+            ts = int(time.time() if now is None else now)
+            alerts = []
+            for rule_id, rule, listing, kind in zip(rule_ids.tolist(), rules.tolist(), listings.tolist(), kinds.tolist()):
+                r = records[listing]
+                alerts.append({
+                    'rule_id': rule_id,
+                    'target': targets.get(rule_id),
+                    'kind': 'below' if kind == 0 else 'drop',
+                    'threshold': int(index.below[rule] if kind == 0 else index.drops[rule]),
+                    'internalPid': int(r['internalPid']),
+                    'site_name': r.get('site_name'),
+                    'name': r.get('name'),
+                    'cur_price': int(r['cur_price']),
+                    'price_drop_per': int(drops[listing]),
+                    'link': r.get('link'),
+                    'ts': ts,
+                })
+        count('alerts_fired', len(alerts))
+        for sink in self.sinks:
+            sink.send(alerts)
+        return alerts
+
+    def on_persist(self, delta, listings):
+        return self.evaluate(delta.get('added', []) + delta.get('changed', []))
+
+
+def _drop_per(record):
+    drop = record.get('price_drop_per')
+    if drop is not None:
+        return int(drop)
+    last, cur = record.get('last_price'), record.get('cur_price')
+    if last and cur is not None and last > cur:
+        return int((last - cur) * 100 // last)
+    return 0
+
+
+# --- SINKS ---
+class FileSink:
+    """Append alerts to a JSON Lines file."""
+
+    def __init__(self, path=ALERTS_LOG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        # One encoder for every line: json.dumps(..., ensure_ascii=False) builds a new one per call
+        self._encode = json.JSONEncoder(ensure_ascii=False).encode
+
+    def send(self, alerts):
+        if not alerts:
+            return
+        text = '\n'.join(map(self._encode, alerts)) + '\n'
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(text)
+
+
+class WebhookSink:
+    """
+    POST alerts as JSON ({"alerts": [...]}) in batches of `batch_size`.
+    Delivery failures are counted, not raised: a dead webhook must not stop scraping.
+    """
+
+    def __init__(self, url, batch_size=500, timeout=5, session=None):
+        import requests
+        self.url = url
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.failures = 0
+
+    def send(self, alerts):
+        import requests
+        for i in range(0, len(alerts), self.batch_size):
+            try:
+                response = self.session.post(self.url, json={'alerts': alerts[i:i + self.batch_size]},
+                                             timeout=self.timeout)
+                response.raise_for_status()
+            except requests.RequestException:
+                self.failures += 1
+                count('alert_webhook_failures')
+
+
+def serve_webhook_stub():
+    """
+    Local webhook receiver for offline runs: returns (server, url, received), where
+    received collects every alert POSTed to url. Call server.shutdown() when done.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    received = []
+
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            received.extend(json.loads(body).get('alerts', []))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), WebhookHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/alerts", received
+
+
+# --- CLI ---
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Price-drop watch rules.")
+    parser.add_argument('--db', default=ALERTS_DB_PATH, help="rules database (default: alerts.db)")
+    sub = parser.add_subparsers(dest='command', required=True)
+    add = sub.add_parser('add', help="watch a product")
+    add.add_argument('internal_pid', type=int)
+    add.add_argument('--below', type=int, help="notify when the price goes below this (₹)")
+    add.add_argument('--drop', type=int, help="notify when the drop reaches this percentage")
+    add.add_argument('--site', help="only this store (default: any)")
+    add.add_argument('--target', help="who to notify")
+    remove = sub.add_parser('remove', help="delete a rule")
+    remove.add_argument('rule_id', type=int)
+    listing = sub.add_parser('list', help="show rules")
+    listing.add_argument('internal_pid', type=int, nargs='?')
+    args = parser.parse_args(argv)
+
+    rules = AlertRules(args.db)
+    try:
+        if args.command == 'add':
+            rule_id = rules.add(args.internal_pid, args.below, args.drop, args.site, args.target)
+            print(f"Rule #{rule_id}: watching {args.internal_pid}")
+        elif args.command == 'remove':
+            print(f"Rule #{args.rule_id} removed" if rules.remove(args.rule_id) else f"No rule #{args.rule_id}")
+        else:
+            for rule_id, pid, site, below, drop, target in rules.rules(args.internal_pid):
+                conditions = ' or '.join(c for c in (below and f"below ₹{below:,}", drop and f"drop >= {drop}%") if c)
+                print(f"#{rule_id}: {pid} at {site or 'any store'}: {conditions} -> {target or '-'}")
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 1
+    finally:
+        rules.close()
+    return 0
+
+
+# --- BENCHMARK ---
+def _synthetic_scrape(n, seed=9):
+    rng = np.random.default_rng(seed)
+    prices = rng.integers(500, 150000, n)
+    drops = rng.integers(0, 70, n)
+    sites = np.array(['Amazon', 'Flipkart', 'Croma'])[rng.integers(0, 3, n)]
+    return [{'internalPid': 10_000_000 + i, 'site_name': str(sites[i]), 'name': f"Product {i}",
+             'cur_price': int(prices[i]), 'price_drop_per': int(drops[i]), 'link': f"https://example.com/p/{i}"}
+            for i in range(n)]
+
+
+def _synthetic_rules(records, n, seed=10):
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(records), n)
+    factors = rng.uniform(0.5, 1.05, n)          # most price targets sit below today's price
+    drop_targets = rng.integers(5, 90, n)
+    kind = rng.random(n)
+    for i in range(n):
+        r = records[picks[i]]
+        below = int(r['cur_price'] * factors[i]) if kind[i] < 0.6 else None
+        drop = int(drop_targets[i]) if kind[i] >= 0.5 else None   # 10% have both
+        site = r['site_name'] if kind[i] < 0.1 else None
+        yield (r['internalPid'], below, drop, site, f"user{i % 50000}@example.com")
+
+
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] == '--bench':
+    import shutil
+    import tempfile
+
+    # Usage: python alerts.py --bench [rules] [products]   (default 1M rules x 100k products)
+    n_rules = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+    n_products = int(sys.argv[3]) if len(sys.argv) > 3 else 100_000
+    work = tempfile.mkdtemp()
+    try:
+        records = _synthetic_scrape(n_products)
+        rules = AlertRules(os.path.join(work, 'alerts.db'))
+        start = time.perf_counter()
+        rules.add_many(_synthetic_rules(records, n_rules))
+        print(f"Stored {n_rules:,} rules in {time.perf_counter() - start:.2f}s")
+
+        sink = FileSink(os.path.join(work, 'alerts.jsonl'))
+        engine = AlertEngine(rules, [sink])
+        start = time.perf_counter()
+        engine._get_index()
+        print(f"Index built in {time.perf_counter() - start:.2f}s")
+
+        for label in ('first scrape', 'same prices again'):
+            start = time.perf_counter()
+            fired = engine.evaluate(records)
+            print(f"{label:18} {n_products:,} listings x {n_rules:,} rules: {len(fired):,} alerts in "
+                  f"{time.perf_counter() - start:.2f}s")
+
+        # A tenth of the prices move; only those listings are checked (as from a delta)
+        moved = [dict(r, cur_price=r['cur_price'] * 9 // 10, price_drop_per=r['price_drop_per'] + 10)
+                 for r in records[::10]]
+        start = time.perf_counter()
+        fired = engine.evaluate(moved)
+        print(f"{'10% repriced':18} {len(moved):,} listings: {len(fired):,} alerts in {time.perf_counter() - start:.2f}s")
+
+        server, url, received = serve_webhook_stub()
+        try:
+            WebhookSink(url).send(fired[:5000])
+            print(f"Webhook stub received {len(received):,} alerts")
+        finally:
+            server.shutdown()
+        rules.close()
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+elif __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,22 @@
-import streamlit as st
-import json
 import os
+import time
+import streamlit as st
+from catalog import get_catalog
+from metrics import METRICS, start_http_server, timer
+
+# Cards rendered per results page (override with RESULTS_PAGE_SIZE)
+PAGE_SIZE = max(1, int(os.environ.get('RESULTS_PAGE_SIZE', 12)))
+# Stage timings/counters at http://127.0.0.1:$METRICS_PORT/metrics (off unless set)
+if os.environ.get('METRICS_PORT'):
+    start_http_server(int(os.environ['METRICS_PORT']))
+# Result orderings -> catalog sort column (None = search relevance)
+SORT_OPTIONS = {
+    "Relevance": None,
+    "Price: low to high": 'cur_price',
+    "Biggest price drop": 'price_drop_per',
+    "Top rated": 'rating',
+    "Best deal": 'deal_score',
+}
 
 # --- STREAMLIT CONFIG ---
 st.set_page_config(page_title="Price-Comparison System", page_icon="📊", layout="wide")
@@ -34,16 +50,8 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-def load_manual_products():
-    try:
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        products_path = os.path.join(script_dir, 'products.json')
-        if os.path.exists(products_path):
-            with open(products_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
-    except Exception as e:
-        return []
+def change_results_page(step):
+    st.session_state.results_page += step
 
 # --- TOP BRANDING ---
 st.markdown("""
@@ -83,18 +91,53 @@ elif st.session_state.page == 'Services':
 
 else:
     if search_query:
-        all_products = load_manual_products()
-        filtered = [p for p in all_products if search_query.lower() in p.get('name', '').lower()]
+        s1, s2, s3 = st.columns([2, 1, 1])
+        with s1:
+            sort_label = st.selectbox("Sort by", list(SORT_OPTIONS), key='results_sort')
+        with s2:
+            min_price = st.number_input("Min price (₹)", min_value=0, value=0, step=1000, key='results_min_price')
+        with s3:
+            max_price = st.number_input("Max price (₹, 0 = any)", min_value=0, value=0, step=1000, key='results_max_price')
+        search_args = {
+            'sort': SORT_OPTIONS[sort_label],
+            'min_price': min_price or None,
+            'max_price': max_price or None,
+        }
+
+        # New query, sort or price range -> back to the first page
+        results_key = (search_query, sort_label, min_price, max_price)
+        if st.session_state.get('results_query') != results_key:
+            st.session_state.results_query = results_key
+            st.session_state.results_page = 0
+
+        # Ranked lookup in the prebuilt name index (best match first, cheaper wins ties),
+        # one entry per product with its store offers cheapest first.
+        # Only the current page is materialized; the total comes from the index.
+        total, filtered = get_catalog().search_grouped(search_query, limit=PAGE_SIZE, offset=st.session_state.results_page * PAGE_SIZE, **search_args)
+        page_count = -(-total // PAGE_SIZE)
+        if total and st.session_state.results_page >= page_count:
+            # Catalog shrank under us; jump to the last page
+            st.session_state.results_page = page_count - 1
+            total, filtered = get_catalog().search_grouped(search_query, limit=PAGE_SIZE, offset=st.session_state.results_page * PAGE_SIZE, **search_args)
         
         if filtered:
-            st.subheader(f"Found {len(filtered)} results")
+            st.subheader(f"Found {total} results")
+            # Card-sized local thumbnails for this page. Never waits on a download:
+            # cards show the store's image until the background build finishes.
+            # Imported here so requests/Pillow load on the first results page, not at startup
+            from image_cache import get_thumbnails
+            thumbnails = get_thumbnails()
+            with timer('thumbnails'):
+                thumbs = thumbnails.ready(offers[0].get('image') for offers in filtered)
+            render_start = time.perf_counter()
             cols = st.columns(3)
-            for idx, product in enumerate(filtered):
+            for idx, offers in enumerate(filtered):
+                product = offers[0]  # cheapest store
                 with cols[idx % 3]:
                     st.markdown('<div class="product-box">', unsafe_allow_html=True)
                     
                     if product.get('image'):
-                        st.image(product.get('image'), use_container_width=True)
+                        st.image(thumbs.get(product.get('image')) or product.get('image'), use_container_width=True)
                     
                     st.write(f"**{product.get('name')[:50]}...**")
                     
@@ -117,7 +160,23 @@ else:
 
                     st.caption(f"Source: {product.get('site_name')}")
                     st.link_button(f"Go to {product.get('site_name')}", product.get('link'))
+
+                    # Same product at other stores, next cheapest first
+                    for other in offers[1:]:
+                        st.link_button(f"₹{other.get('cur_price', 0):,} on {other.get('site_name')}", other.get('link'))
                     st.markdown('</div>', unsafe_allow_html=True)
+
+            METRICS.observe('render', time.perf_counter() - render_start)
+
+            # --- PAGER ---
+            if page_count > 1:
+                p1, p2, p3 = st.columns([1, 2, 1])
+                with p1:
+                    st.button("◀ PREV", on_click=change_results_page, args=(-1,), disabled=st.session_state.results_page == 0)
+                with p2:
+                    st.markdown(f"<p style='text-align: center; margin-top: 12px;'>Page {st.session_state.results_page + 1} of {page_count}</p>", unsafe_allow_html=True)
+                with p3:
+                    st.button("NEXT ▶", on_click=change_results_page, args=(1,), disabled=st.session_state.results_page >= page_count - 1)
         else:
             st.error("No items found.")
     else:
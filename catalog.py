@@ -0,0 +1,473 @@
+import gc
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+
+from matching import ProductMatcher
+from metrics import count, timer
+from search_index import SearchIndex
+from snapshot_diff import DELTA_PATH, SNAPSHOT_PATH, load_snapshot, read_deltas, record_key, snapshot_seq
+
+# Default catalog file, next to this module (same lookup app.py always used)
+PRODUCTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'products.json')
+# Prebuilt catalog (python catalog.py build): pickled records + search index, memory-mapped columns
+BINARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'catalog.bin')
+BINARY_FORMAT = 6
+
+
+def normalize_product(raw):
+    """
+    Normalize one product record so callers don't need .get() defaults everywhere.
+    Prices and counts become ints, rating stays as given (number or 'N/A').
+    """
+    product = dict(raw)
+    product['name'] = str(raw.get('name') or '')
+    cur_price = _to_int(raw.get('cur_price'), 0)
+    product['cur_price'] = cur_price
+    product['last_price'] = _to_int(raw.get('last_price'), cur_price)
+    product['price_drop_per'] = _to_int(raw.get('price_drop_per'), 0)
+    product['ratingCount'] = _to_int(raw.get('ratingCount'), 0)
+    product['rating'] = raw['rating'] if raw.get('rating') is not None else 'N/A'
+    return product
+
+
+def _to_int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _digest(path):
+    # Content hash, not mtime: deploys copy files and reset their timestamps
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+    except OSError:
+        return None
+
+
+class CatalogCache:
+    """
+    Process-wide cache of the parsed products file.
+    The file is read and parsed once; later calls only stat() it and reload
+    when its mtime or size changed. Counters show hits/misses/reloads.
+
+    With `delta_path`, scraped listings are layered on top: the scraper's
+    snapshot is loaded once and each new line of its delta log (see
+    snapshot_diff.py) is applied in place to the records and the search index.
+
+    Listings of the same product from different stores are grouped by a
+    ProductMatcher kept in step with the records (see search_grouped()).
+
+    With `binary_path`, the first load adopts a snapshot written by save_binary()
+    when it was built from the same products file: unpickling the ready-made
+    index replaces parsing JSON and indexing, and the sort/filter columns are
+    memory-mapped instead of rebuilt. Only load snapshots you built yourself.
+    """
+
+    def __init__(self, path=PRODUCTS_PATH, delta_path=None, snapshot_path=None, binary_path=None):
+        self.path = path
+        self.delta_path = delta_path
+        self.snapshot_path = snapshot_path
+        self.binary_path = binary_path
+        self._lock = threading.Lock()
+        self._records = {}      # record key -> (doc_id, product)
+        self._products = []     # list view of _records, rebuilt after changes
+        self._index = SearchIndex()
+        self._key_of_doc = {}   # search doc id -> record key
+        self._matcher = ProductMatcher()
+        self._columns = None    # ColumnarCatalog over index doc ids, built on demand
+        self._columns_dir = None  # saved columns still matching the index (binary snapshot)
+        self._signature = None  # (mtime_ns, size) of the products file
+        self._delta_offset = 0
+        self._delta_inode = None  # compact_deltas() swaps in a new file
+        self._delta_seq = 0
+        self.stats = {'hits': 0, 'misses': 0, 'reloads': 0, 'errors': 0, 'deltas_applied': 0, 'binary_loads': 0}
+
+    @staticmethod
+    def _stat(path):
+        if not path:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _stat_signature(self):
+        # The snapshot isn't part of it: it is rewritten on every scrape, and the
+        # delta log already carries those changes
+        return self._stat(self.path)
+
+    def _delta_file(self):
+        # (inode, size) of the delta log, None if there is none
+        try:
+            st = os.stat(self.delta_path)
+        except (OSError, TypeError):
+            return None
+        return (st.st_ino, st.st_size)
+
+    def _delta_pending(self):
+        # New bytes appended to the delta log (or it was compacted/truncated)
+        state = self._delta_file()
+        if state is None:
+            return self._delta_offset != 0
+        return state[0] != self._delta_inode or state[1] != self._delta_offset
+
+    def _load(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, list):
+            data = []
+        return [normalize_product(p) for p in data if isinstance(p, dict)]
+
+    def _load_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return 0, []
+        snapshot = load_snapshot(self.snapshot_path)
+        return snapshot.get('seq', 0), [normalize_product(p) for p in snapshot['records'].values()]
+
+    def _put(self, product):
+        key = record_key(product)
+        existing = self._records.get(key)
+        if existing is None:
+            doc_id = self._index.add(product)
+        else:
+            self._key_of_doc.pop(existing[0], None)
+            doc_id = self._index.update(existing[0], product)
+        self._records[key] = (doc_id, product)
+        self._key_of_doc[doc_id] = key
+        self._matcher.add(key, product['name'], product.get('site_name'))
+        self._drop_columns()
+
+    def _apply_delta(self, delta):
+        for key in delta.get('removed', ()):
+            existing = self._records.pop(key, None)
+            if existing is not None:
+                self._index.remove(existing[0])
+                self._key_of_doc.pop(existing[0], None)
+                self._matcher.remove(key)
+                self._drop_columns()
+        for raw in delta.get('added', []) + delta.get('changed', []):
+            self._put(normalize_product(raw))
+        self._delta_seq = delta.get('seq', self._delta_seq)
+        self.stats['deltas_applied'] += 1
+
+    @timer('catalog_delta')
+    def _read_deltas(self, resync=False):
+        state = self._delta_file()
+        if state is None or state[0] != self._delta_inode or state[1] < self._delta_offset:
+            # Log compacted or rotated: start over from the top; seq numbers skip what we have
+            self._delta_offset = 0
+        self._delta_inode = state[0] if state else None
+        deltas, self._delta_offset = read_deltas(self.delta_path, self._delta_offset, after_seq=self._delta_seq)
+        changed = False
+        for delta in deltas:
+            seq = delta.get('seq', 0)
+            if seq <= self._delta_seq:
+                continue
+            if seq > self._delta_seq + 1 and not resync:
+                # Missed deltas (log compacted?): rebuild from the snapshot instead.
+                # The rebuild reads with resync=True: if the snapshot is missing or
+                # behind the log the gap remains, and the log is taken as it is.
+                self._full_load(self._signature)
+                return
+            self._apply_delta(delta)
+            changed = True
+        if changed:
+            self._products = [p for _, p in self._records.values()]
+
+    @timer('catalog_load')
+    def _full_load(self, signature):
+        base = self._load() if signature is not None else []
+        seq, scraped = self._load_snapshot()
+        self._records = {}
+        self._key_of_doc = {}
+        self._matcher = ProductMatcher()
+        self._drop_columns()
+        # Index is built once per load, not per query
+        self._index = SearchIndex(base)
+        for doc_id, product in enumerate(base):
+            key = record_key(product)
+            if key in self._records:
+                key = f"{key}#{doc_id}"  # duplicate hand-made entries stay separate
+            self._records[key] = (doc_id, product)
+            self._key_of_doc[doc_id] = key
+            self._matcher.add(key, product['name'], product.get('site_name'))
+        self._delta_seq = seq
+        for product in scraped:
+            self._put(product)
+        self._products = [p for _, p in self._records.values()]
+        if self.delta_path:
+            self._delta_offset = 0
+            self._read_deltas(resync=True)
+
+    def get_products(self):
+        """Return the normalized product list, reloading only if the files changed."""
+        signature = self._stat_signature()
+        if signature == self._signature and not (self.delta_path and self._delta_pending()):
+            self.stats['hits'] += 1
+            return self._products
+
+        with self._lock:
+            # Another thread may have reloaded while we waited
+            if signature == self._signature:
+                if self.delta_path and self._delta_pending():
+                    self._read_deltas()
+                self.stats['hits'] += 1
+                return self._products
+
+            self.stats['misses'] += 1
+            first_load = self._signature is None
+            try:
+                if not (first_load and self.binary_path and self._restore_binary(signature)):
+                    self._full_load(signature)
+            except (OSError, ValueError):
+                # Keep serving the last good copy if a file is mid-write/broken
+                self.stats['errors'] += 1
+                return self._products
+
+            if not first_load:
+                self.stats['reloads'] += 1
+            self._signature = signature
+            return self._products
+
+    def get_index(self):
+        """Return the search index matching the current file contents."""
+        self.get_products()
+        return self._index
+
+    def search(self, query, limit=None, offset=0):
+        """Ranked search over product names; returns (total_matches, products)."""
+        index = self.get_index()
+        count('searches')
+        with timer('search'):
+            total, ids = index.search_ids(query, limit, offset)
+            return total, [index.get(d) for d in ids]
+
+    def _get_columns(self):
+        # numpy is only imported once someone filters or sorts
+        if self._columns is None:
+            from columnar import ColumnarCatalog
+            if self._columns_dir:
+                self._columns = ColumnarCatalog.load(self._columns_dir)
+            else:
+                self._columns = ColumnarCatalog(self._index.documents())
+        return self._columns
+
+    def _drop_columns(self):
+        self._columns = None
+        self._columns_dir = None
+
+    # --- BINARY SNAPSHOT ---
+    @timer('catalog_restore')
+    def _restore_binary(self, signature):
+        """Adopt the prebuilt snapshot if it matches the products file; False to fall back to JSON."""
+        # Unpickling allocates millions of containers; letting the cyclic GC scan them
+        # over and over while nothing can be garbage yet more than doubles the load time
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(os.path.join(self.binary_path, 'state.pkl'), 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return False
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        if state.get('format') != BINARY_FORMAT or state.get('products_digest') != _digest(self.path):
+            return False
+        self._records = state['records']
+        self._index = state['index']
+        self._key_of_doc = state['key_of_doc']
+        self._matcher = state['matcher']
+        self._delta_seq = state['delta_seq']
+        self._delta_offset = state['delta_offset'] if self.delta_path else 0
+        self._columns = None
+        self._columns_dir = os.path.join(self.binary_path, 'columns')
+        self._products = [p for _, p in self._records.values()]
+        self._signature = signature
+        self.stats['binary_loads'] += 1
+        if self.delta_path:
+            # Scrapes since the build: replay the delta log from where the build stopped
+            self._read_deltas()
+        if self.snapshot_path and snapshot_seq(self.snapshot_path) > self._delta_seq:
+            # Deltas we'd need are gone from the log; the scraper snapshot has them
+            self._full_load(signature)
+        return True
+
+    def save_binary(self, path=None):
+        """
+        Write the loaded catalog as a binary snapshot directory (state.pkl + columns/)
+        for fast startup. Returns the path.
+        """
+        path = path or self.binary_path or BINARY_PATH
+        self.get_products()
+        with self._lock:
+            tmp_path = path + '.tmp'
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+            self._get_columns().save(os.path.join(tmp_path, 'columns'))
+            state = {
+                'format': BINARY_FORMAT,
+                'products_digest': _digest(self.path),
+                'records': self._records,
+                'index': self._index,
+                'key_of_doc': self._key_of_doc,
+                'matcher': self._matcher,
+                'delta_seq': self._delta_seq,
+                'delta_offset': self._delta_offset,
+            }
+            with open(os.path.join(tmp_path, 'state.pkl'), 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        old_path = path + '.old'
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        return path
+
+    def search_grouped(self, query, limit=None, offset=0, sort=None, min_price=None, max_price=None):
+        """
+        Like search(), but one entry per product: each result is that product's
+        offers across stores, cheapest first. Ranked by the best-ranked listing,
+        or by a column (see columnar.SORTS) when `sort` is given. The price range
+        and sort run vectorized over the columnar view of the index.
+        Returns (total_products, [offers, ...]).
+        """
+        index = self.get_index()
+        count('searches')
+        with self._lock, timer('search'):
+            if sort is None:
+                ids = index.match(query)
+                if min_price is not None or max_price is not None:
+                    columns = self._get_columns()
+                    ids = columns.filter_price(columns.positions(ids), min_price, max_price).tolist()
+                ranked = index.iter_ranked(query, ids)
+            else:
+                columns = self._get_columns()
+                positions = columns.filter_price(columns.positions(index.match(query)), min_price, max_price)
+                ids = ranked = columns.sort(positions, sort).tolist()
+            # Total product count needs no ranking; the page only needs the
+            # first offset + limit groups, so stop ranking once they're found.
+            key_of_doc, group_of = self._key_of_doc, self._matcher.group_of
+            total = len({group_of(key_of_doc[d]) for d in ids if d in key_of_doc})
+            wanted = None if limit is None else offset + limit
+            order = {}
+            for doc_id in ranked:
+                key = key_of_doc.get(doc_id)
+                if key is not None:
+                    order.setdefault(group_of(key), key)
+                    if len(order) == wanted:
+                        break
+            page = list(order)[offset:]
+            results = []
+            for group in page:
+                offers = [self._records[k][1] for k in self._matcher.members(group) if k in self._records]
+                offers.sort(key=lambda p: p['cur_price'])
+                results.append(offers)
+        return total, results
+
+    def invalidate(self):
+        """Force the next get_products() to re-read the files."""
+        with self._lock:
+            self._signature = None
+
+
+# Shared instance: Streamlit re-runs app.py on every interaction but imported
+# modules stay loaded, so this survives across reruns and sessions.
+_default_catalog = None
+_default_lock = threading.Lock()
+
+
+def get_catalog(path=PRODUCTS_PATH):
+    """Shared catalog: products.json plus the scraper's snapshot and delta log."""
+    global _default_catalog
+    if _default_catalog is None or _default_catalog.path != path:
+        with _default_lock:
+            if _default_catalog is None or _default_catalog.path != path:
+                _default_catalog = CatalogCache(path, delta_path=DELTA_PATH, snapshot_path=SNAPSHOT_PATH,
+                                                binary_path=BINARY_PATH)
+    return _default_catalog
+
+
+# --- BUILD / STARTUP BENCHMARK ---
+_STARTUP_PROBE = r"""
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, {here!r})
+import catalog
+imported = time.perf_counter()
+cache = catalog.CatalogCache({products!r}, binary_path={binary!r})
+for i, query in enumerate(('samsung', 's23 ultra', 'pixel graphite')):
+    t = time.perf_counter()
+    total, _ = cache.search_grouped(query, limit=12)
+    if i == 0:
+        first = time.perf_counter()
+    else:
+        warm = time.perf_counter() - t
+t = time.perf_counter()
+cache.search_grouped('samsung', limit=12, sort='cur_price', max_price=50000)
+sort_ms = (time.perf_counter() - t) * 1000
+print((imported - start) * 1000, (first - imported) * 1000, warm * 1000, sort_ms, cache.stats['binary_loads'])
+"""
+
+
+def _startup_bench(n):
+    import subprocess
+    import sys
+    import tempfile
+    import time
+
+    from search_index import _synthetic_products
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    work = tempfile.mkdtemp()
+    try:
+        products_path = os.path.join(work, 'products.json')
+        products = _synthetic_products(n)
+        for i, p in enumerate(products):
+            p.update(link=f"https://example.com/p/{i}", internalPid=i, last_price=p['cur_price'] + 999,
+                     price_drop_per=5, rating=4.2, ratingCount=i % 5000)
+        with open(products_path, 'w', encoding='utf-8') as f:
+            json.dump(products, f, indent=4)
+        binary_path = os.path.join(work, 'catalog.bin')
+        start = time.perf_counter()
+        CatalogCache(products_path, binary_path=binary_path).save_binary()
+        print(f"{n:,} products: products.json {os.path.getsize(products_path) / 1e6:.1f} MB, "
+              f"binary snapshot built in {time.perf_counter() - start:.1f}s")
+
+        t = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'import streamlit'], check=True)
+        print(f"import streamlit (new process): {(time.perf_counter() - t) * 1000:.0f} ms incl. interpreter start")
+        # Cold: a new process (import + load + first search). Warm: the next searches in it.
+        for label, binary in (('products.json', None), ('binary snapshot', binary_path)):
+            probe = _STARTUP_PROBE.format(here=here, products=products_path, binary=binary)
+            out = subprocess.run([sys.executable, '-c', probe], check=True, capture_output=True, text=True).stdout
+            import_ms, first_ms, warm_ms, sort_ms, restored = out.split()
+            print(f"{label:16} import {float(import_ms):5.0f} ms | cold first query {float(first_ms):6.0f} ms | "
+                  f"warm query {float(warm_ms):5.1f} ms | first sorted+filtered query {float(sort_ms):5.0f} ms"
+                  f"{'' if restored == '1' or binary is None else '  (snapshot not used!)'}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Usage:
+    #   python catalog.py build          prebuild catalog.bin from products.json + the scraper output
+    #   python catalog.py --bench [n]    startup time with and without the snapshot (default 100k products)
+    if len(sys.argv) > 1 and sys.argv[1] == 'build':
+        catalog = CatalogCache(PRODUCTS_PATH, delta_path=DELTA_PATH, snapshot_path=SNAPSHOT_PATH, binary_path=BINARY_PATH)
+        path = catalog.save_binary()
+        print(f"SUCCESS: {len(catalog.get_products())} products written to {path}")
+    elif len(sys.argv) > 1 and sys.argv[1] == '--bench':
+        _startup_bench(int(sys.argv[2]) if len(sys.argv) > 2 else 100_000)
+    else:
+        print("Usage: python catalog.py build | python catalog.py --bench [products]")
@@ -0,0 +1,155 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+# Sort keys the UI offers: column -> descending?
+SORTS = {
+    'cur_price': False,
+    'price_drop_per': True,
+    'rating': True,
+    'deal_score': True,
+}
+
+
+class ColumnarCatalog:
+    """
+    Typed sort/filter index over the catalog: int32 prices, int16 drop %,
+    float32 ratings, aligned to search-index doc ids. Price ranges and sorts
+    are vectorized over row positions; the listings themselves stay the
+    index's dicts, so this is an added index, not a copy of the catalog.
+    Rows may be None (removed listings); they are masked out.
+    """
+
+    def __init__(self, records):
+        n = len(records)
+        present = [r is not None for r in records]
+        rows = [r if r is not None else {} for r in records]
+        self.valid = np.fromiter(present, dtype=bool, count=n)
+        self.cur_price = np.fromiter((_int(r.get('cur_price')) for r in rows), dtype=np.int32, count=n)
+        self.price_drop_per = np.fromiter((_int(r.get('price_drop_per')) for r in rows), dtype=np.int16, count=n)
+        self.rating = np.fromiter((_float(r.get('rating')) for r in rows), dtype=np.float32, count=n)
+        self.rating_count = np.fromiter((_int(r.get('ratingCount')) for r in rows), dtype=np.int32, count=n)
+        # Drop % weighted by how many people rated it: a 40% drop on a phone with
+        # 50k reviews beats the same drop on an unknown listing
+        self.deal_score = (self.price_drop_per.astype(np.float32) * np.log1p(self.rating_count, dtype=np.float32))
+
+    def __len__(self):
+        return len(self.valid)
+
+    def positions(self, ids=None):
+        """Valid row positions, optionally restricted to ids (any iterable of ints)."""
+        if ids is None:
+            return np.flatnonzero(self.valid)
+        ids = np.fromiter(ids, dtype=np.int64)
+        return ids[self.valid[ids]]
+
+    def filter_price(self, positions, min_price=None, max_price=None):
+        prices = self.cur_price[positions]
+        mask = np.ones(len(positions), dtype=bool)
+        if min_price is not None:
+            mask &= prices >= min_price
+        if max_price is not None:
+            mask &= prices <= max_price
+        return positions[mask]
+
+    def sort(self, positions, by='cur_price', descending=None):
+        """Order positions by a column (see SORTS); ties keep the cheaper row first."""
+        if descending is None:
+            descending = SORTS[by]
+        # Two stable sorts (price, then the key) beat np.lexsort on mixed dtypes
+        order = np.argsort(self.cur_price[positions], kind='stable')
+        values = getattr(self, by)[positions[order]]
+        if by == 'rating':
+            values = np.nan_to_num(values, nan=-1.0)
+        if descending:
+            values = -values.astype(np.float32 if values.dtype.kind == 'f' else np.int32)
+        return positions[order[np.argsort(values, kind='stable')]]
+
+    # --- BINARY SNAPSHOT ---
+    _ARRAYS = ('valid', 'cur_price', 'price_drop_per', 'rating', 'rating_count', 'deal_score')
+
+    def save(self, directory):
+        """Write the columns to `directory`, one .npy per column."""
+        os.makedirs(directory, exist_ok=True)
+        for name in self._ARRAYS:
+            np.save(os.path.join(directory, name + '.npy'), np.asarray(getattr(self, name)))
+
+    @classmethod
+    def load(cls, directory):
+        """Open columns written by save(), memory-mapped read-only."""
+        columns = cls.__new__(cls)
+        for name in cls._ARRAYS:
+            setattr(columns, name, np.load(os.path.join(directory, name + '.npy'), mmap_mode='r'))
+        return columns
+
+    def memory_bytes(self):
+        return sum(getattr(self, name).nbytes for name in self._ARRAYS)
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+# --- BENCHMARK ---
+def _synthetic_records(n):
+    rng = np.random.default_rng(11)
+    prices = rng.integers(500, 150000, n)
+    drops = rng.integers(0, 70, n)
+    ratings = np.round(rng.uniform(3, 5, n), 1)
+    counts = rng.integers(0, 100000, n)
+    sites = np.array(['Amazon', 'Flipkart', 'Croma', 'Reliance Digital'])[rng.integers(0, 4, n)]
+    return [
+        {'name': f"Product {i}", 'cur_price': int(prices[i]), 'last_price': int(prices[i] * 100 // (100 - drops[i])),
+         'price_drop_per': int(drops[i]), 'rating': float(ratings[i]), 'ratingCount': int(counts[i]),
+         'site_name': str(sites[i]), 'link': f"https://example.com/p/{i}", 'image': f"https://img.example.com/{i}.jpg"}
+        for i in range(n)
+    ]
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    import tracemalloc
+
+    # Usage: python columnar.py [rows]   (default 1M)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    tracemalloc.start()
+    records = _synthetic_records(n)
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    columns = ColumnarCatalog(records)
+    print(f"{n:,} rows: list of dicts {dict_bytes / 1e6:,.0f} MB | columnar index adds {columns.memory_bytes() / 1e6:,.0f} MB")
+
+    # Both sides return the same 30 dicts; the columnar side only picks which ones
+    lo, hi = 10000, 50000
+    checks = [
+        ('price filter + sort by price',
+         lambda: sorted((r for r in records if lo <= r.get('cur_price', 0) <= hi), key=lambda r: r.get('cur_price', 0))[:30],
+         lambda: columns.sort(columns.filter_price(columns.positions(), lo, hi), 'cur_price')[:30]),
+        ('sort by drop %',
+         lambda: sorted(records, key=lambda r: (-r.get('price_drop_per', 0), r.get('cur_price', 0)))[:30],
+         lambda: columns.sort(columns.positions(), 'price_drop_per')[:30]),
+        ('sort by deal score',
+         lambda: sorted(records, key=lambda r: -r.get('price_drop_per', 0) * np.log1p(r.get('ratingCount', 0)))[:30],
+         lambda: columns.sort(columns.positions(), 'deal_score')[:30]),
+    ]
+    for label, with_dicts, with_columns in checks:
+        _, dict_ms = _timed(with_dicts)
+        _, col_ms = _timed(lambda: [records[p] for p in with_columns()])
+        print(f"{label:30} dicts {dict_ms:9.1f} ms | columnar {col_ms:8.1f} ms")
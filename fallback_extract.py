@@ -0,0 +1,135 @@
+import re
+
+# --- PRECOMPILED PATTERNS (built once at import, not per call) ---
+# Every product record starts with name:"..."; scanning for that is one C-level pass
+_NAME_ANCHOR = re.compile(r'\bname\s*:\s*(?=")')
+# One flat `key: "string"` or `key: number` field (with its leading comma).
+# The string branch is unrolled, so there is nothing to backtrack into.
+_FIELD = re.compile(r'\s*,?\s*([A-Za-z_$][\w$]*)\s*:\s*(?:"([^"\\]*(?:\\.[^"\\]*)*)"|(-?\d+(?:\.\d+)?))')
+
+# Feature counters Buyhatke exposes (spendButtonClicked: 218, ...), looked up by name
+FEATURE_KEYS = ['spendButtonClicked', 'GraphClicked', 'AutoCouponClicked', 'DittoOpened', 'WatchPriceClicked', 'CompareBarNewHovered']
+_FEATURES = re.compile(r'\b(' + '|'.join(FEATURE_KEYS) + r')\s*:\s*(\d+)')
+
+# Output field order, same as parse_html.py has always produced
+TRENDING_FIELDS = ['name', 'image', 'link', 'cur_price', 'last_price', 'price_drop_per', 'date', 'site_name',
+                   'site_logo', 'site_pos', 'internalPid', 'rating', 'ratingCount']
+DEAL_FIELDS = TRENDING_FIELDS + ['score']
+# Records missing any of these are not products (e.g. supportedStoresFeatureInfo entries)
+_REQUIRED = {'name', 'cur_price', 'last_price', 'price_drop_per', 'site_name', 'internalPid', 'ratingCount'}
+_INT_FIELDS = {'cur_price', 'last_price', 'price_drop_per', 'site_pos', 'internalPid', 'ratingCount', 'score'}
+
+
+def iter_records(text):
+    """
+    Yield the flat field dict of every `{name: "...", ...}` record in text.
+    Fields are read in order from the name: anchor until the first nested value
+    or closing brace, so their order and extra fields don't matter.
+    """
+    match_field = _FIELD.match
+    for anchor in _NAME_ANCHOR.finditer(text):
+        fields = {}
+        pos = anchor.start()
+        while True:
+            m = match_field(text, pos)
+            if m is None:
+                break
+            key, string_value, number_value = m.groups()
+            if key in fields:
+                break  # ran into the next record
+            fields[key] = string_value if string_value is not None else number_value
+            pos = m.end()
+        if _REQUIRED.issubset(fields):
+            yield fields
+
+
+def _number(value, field):
+    if value is None:
+        return None
+    if field in _INT_FIELDS:
+        return int(float(value))
+    return float(value)
+
+
+def _build(fields, names):
+    record = {}
+    for field in names:
+        value = fields.get(field)
+        if field == 'rating':
+            # Buyhatke uses -1 for "no rating yet"
+            value = _number(value, field) if value not in (None, '-1') else None
+        elif field in _INT_FIELDS:
+            value = _number(value, field)
+        elif value == '':
+            value = None
+        record[field] = value
+    return record
+
+
+def extract_records(text_content):
+    """
+    Fallback extraction over raw HTML/JS text.
+    Records carrying a `score` are exclusive deals, the rest trending products.
+    """
+    extracted = {
+        'trendingProducts': [],
+        'exclusiveDealsProducts': [],
+        'features': {}
+    }
+    trending = extracted['trendingProducts']
+    deals = extracted['exclusiveDealsProducts']
+    for fields in iter_records(text_content):
+        if 'score' in fields:
+            deals.append(_build(fields, DEAL_FIELDS))
+        else:
+            trending.append(_build(fields, TRENDING_FIELDS))
+
+    for key, value in _FEATURES.findall(text_content):
+        extracted['features'][key] = int(value)
+    return extracted
+
+
+# --- BENCHMARK ---
+def _legacy_extract(text_content):
+    # The three inline re.findall passes extract_from_text_fallback used before this module
+    trending_pattern = r'name\s*:\s*"([^"]*)"\s*,\s*image\s*:\s*"([^"]*)"\s*,\s*link\s*:\s*"([^"]*)"\s*,\s*cur_price\s*:\s*(\d+)\s*,\s*last_price\s*:\s*(\d+)\s*,\s*price_drop_per\s*:\s*(\d+)\s*,\s*date\s*:\s*"([^"]*)"\s*,\s*site_name\s*:\s*"([^"]*)"\s*,\s*site_logo\s*:\s*"([^"]*)"\s*,\s*site_pos\s*:\s*(\d+)\s*,\s*internalPid\s*:\s*(\d+)\s*,\s*rating\s*:\s*([\d.]+)\s*,\s*ratingCount\s*:\s*(\d+)'
+    deals_pattern = r'name\s*:\s*"([^"]*)"\s*,\s*(?:image\s*:\s*"([^"]*)"\s*,\s*)?(?:link\s*:\s*"([^"]*)"\s*,\s*)?cur_price\s*:\s*(\d+)\s*,\s*last_price\s*:\s*(\d+)\s*,\s*price_drop_per\s*:\s*(\d+)\s*,\s*(?:date\s*:\s*"([^"]*)"\s*,\s*)?site_name\s*:\s*"([^"]*)"\s*,\s*(?:site_logo\s*:\s*"([^"]*)"\s*,\s*)?(?:site_pos\s*:\s*(\d+)\s*,\s*)?internalPid\s*:\s*(\d+)\s*,\s*(?:rating\s*:\s*(-?\d+)\s*,\s*)?ratingCount\s*:\s*(\d+)\s*,\s*score\s*:\s*(\d+)'
+    features_pattern = r'([a-zA-Z]+(?:[A-Z][a-zA-Z]*)*)\s*:\s*(\d+)'
+    trending = re.findall(trending_pattern, text_content, re.DOTALL | re.MULTILINE)
+    deals = re.findall(deals_pattern, text_content, re.DOTALL | re.MULTILINE)
+    features = {k: int(v) for k, v in re.findall(features_pattern, text_content, re.MULTILINE) if k in FEATURE_KEYS}
+    return {'trendingProducts': trending, 'exclusiveDealsProducts': deals, 'features': features}
+
+
+def _corpus(directory):
+    import os
+    pages = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.html'):
+            with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                pages[name] = f.read()
+    return pages
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+    import time
+
+    # Usage: python fallback_extract.py [fixtures_dir] [copies]
+    # Runs both extractors over every saved page, each inflated by repetition.
+    here = os.path.dirname(os.path.abspath(__file__))
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.path.join(here, 'fixtures')
+    copies = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    for name, page in _corpus(directory).items():
+        big = page * copies
+        print(f"\n=== {name} x{copies} ({len(big) / 1e6:.1f} MB) ===")
+        for label, run in (('precompiled engine', extract_records), ('inline findall (old)', _legacy_extract)):
+            best = float('inf')
+            for _ in range(3):
+                start = time.perf_counter()
+                result = run(big)
+                best = min(best, time.perf_counter() - start)
+            counts = ', '.join(f"{len(v)} {k}" for k, v in result.items())
+            print(f"{label:22} {best * 1000:9.1f} ms  ({counts})")
@@ -0,0 +1,255 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import count, timer
+
+# Browser-like headers Buyhatke expects (moved here from parse_html.py)
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+# Worth retrying: throttling and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """
+    Token bucket shared by all workers: at most `rate` requests per second,
+    with bursts of up to `burst` requests.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class FetchResult:
+    """Outcome of one URL: the response text, or the error that ended the retries."""
+
+    __slots__ = ('url', 'status', 'text', 'headers', 'error', 'attempts', 'elapsed', 'not_modified')
+
+    def __init__(self, url, status=None, text=None, headers=None, error=None, attempts=0, elapsed=0.0,
+                 not_modified=False):
+        self.url = url
+        self.status = status
+        self.text = text
+        self.headers = headers or {}
+        self.error = error
+        self.attempts = attempts
+        self.elapsed = elapsed
+        self.not_modified = not_modified  # 304: text came from the HTTP cache
+
+    @property
+    def ok(self):
+        return self.error is None and self.status is not None and self.status < 400
+
+    def __repr__(self):
+        return f"FetchResult({self.url!r}, status={self.status}, error={self.error!r}, attempts={self.attempts})"
+
+
+class Fetcher:
+    """
+    Concurrent page fetcher over one pooled requests.Session.
+    - `workers` threads share the session's keep-alive connections
+    - at most `per_host` requests in flight to any single host
+    - optional global `rate` limit (requests/second)
+    - retries on connection errors / 429 / 5xx with exponential backoff + jitter
+    - optional `cache` (http_cache.HttpCache) for conditional GETs in fetch()
+    """
+
+    def __init__(self, workers=8, per_host=4, rate=None, retries=3, backoff=0.5,
+                 timeout=10, headers=None, session=None, cache=None):
+        self.workers = max(1, int(workers))
+        self.per_host = max(1, int(per_host))
+        self.retries = max(0, int(retries))
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate, burst=self.workers) if rate else None
+        self.cache = cache
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max(self.workers, self.per_host))
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        session.headers.update(headers or DEFAULT_HEADERS)
+        self.session = session
+
+        self._host_slots = {}
+        self._host_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.flush()
+
+    def _slot(self, url):
+        host = urlsplit(url).netloc
+        with self._host_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return slot
+
+    def _sleep_before_retry(self, attempt, response=None):
+        delay = self.backoff * (2 ** attempt)
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+        time.sleep(delay * (0.5 + random.random()))
+
+    def get(self, url, **kwargs):
+        """
+        GET one URL with host limit, rate limit and retries.
+        Returns the requests.Response; raises requests.RequestException on final failure.
+        """
+        slot = self._slot(url)
+        attempt = 0
+        while True:
+            if self.limiter:
+                self.limiter.acquire()
+            try:
+                with slot:
+                    response = self.session.get(url, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.retries:
+                    raise
+                self._sleep_before_retry(attempt)
+                attempt += 1
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                response.close()
+                self._sleep_before_retry(attempt, response)
+                attempt += 1
+                continue
+            response.raise_for_status()
+            response.attempts = attempt + 1
+            return response
+
+    @timer('fetch')
+    def fetch(self, url, **kwargs):
+        """
+        Like get(), but never raises: failures are reported in the FetchResult.
+        With a cache, sends If-None-Match/If-Modified-Since and on 304 returns the
+        cached body with not_modified=True (no body downloaded).
+        """
+        start = time.perf_counter()
+        try:
+            if self.cache is None:
+                response = self.get(url, **kwargs)
+            else:
+                headers = dict(kwargs.pop('headers', None) or {})
+                conditional = self.cache.conditional_headers(url)
+                response = self.get(url, headers={**headers, **conditional}, **kwargs)
+                if response.status_code == 304:
+                    text = self.cache.not_modified(url)
+                    if text is not None:
+                        count('fetch_not_modified')
+                        return FetchResult(url, status=304, text=text, headers=response.headers,
+                                           attempts=response.attempts, elapsed=time.perf_counter() - start,
+                                           not_modified=True)
+                    # Cached body went missing; ask again without validators
+                    response = self.get(url, headers=headers, **kwargs)
+                if response.status_code == 200:
+                    self.cache.store(url, response.text, response.headers)
+        except requests.RequestException as e:
+            status = e.response.status_code if e.response is not None else None
+            count('fetch_errors')
+            return FetchResult(url, status=status, error=str(e), elapsed=time.perf_counter() - start)
+        count('fetch_bytes', len(response.content))
+        return FetchResult(url, status=response.status_code, text=response.text, headers=response.headers,
+                           attempts=response.attempts, elapsed=time.perf_counter() - start)
+
+    def fetch_many(self, urls):
+        """Fetch all URLs concurrently; results come back in input order."""
+        urls = list(urls)
+        if self.workers == 1 or len(urls) <= 1:
+            return [self.fetch(u) for u in urls]
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='fetch') as pool:
+            return list(pool.map(self.fetch, urls))
+
+
+# --- OFFLINE BENCHMARK ---
+def serve_fixtures(directory, latency=0.0):
+    """
+    Start a local HTTP server that serves saved HTML fixtures from `directory`,
+    sleeping `latency` seconds per request to mimic a remote site.
+    Returns (server, base_url); call server.shutdown() when done.
+    """
+    import functools
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+    class FixtureHandler(SimpleHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, so pooling is measurable
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+            super().do_GET()
+
+        def log_message(self, *args):
+            pass
+
+    handler = functools.partial(FixtureHandler, directory=directory)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    # Usage: python fetcher.py [requests] [latency_seconds]
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+    server, base = serve_fixtures(fixtures, latency)
+    names = sorted(n for n in os.listdir(fixtures) if n.endswith('.html'))
+    urls = [f"{base}/{names[i % len(names)]}?page={i}" for i in range(total)]
+    try:
+        for workers in (1, 8, 64):
+            with Fetcher(workers=workers, per_host=workers) as fetcher:
+                start = time.perf_counter()
+                results = fetcher.fetch_many(urls)
+                elapsed = time.perf_counter() - start
+            ok = sum(r.ok for r in results)
+            size = sum(len(r.text or '') for r in results)
+            print(f"{workers:3} workers: {total} pages in {elapsed:6.2f}s -> {total / elapsed:8.1f} pages/s ({ok} ok, {size / 1e6:.1f} MB)")
+    finally:
+        server.shutdown()
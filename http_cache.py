@@ -0,0 +1,172 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.http_cache')
+
+
+class HttpCache:
+    """
+    Persistent HTTP response cache keyed by URL.
+    Bodies are stored gzip-compressed on disk next to an index.json holding the
+    validators (ETag / Last-Modified) used for conditional GETs.
+    - entries older than `ttl` seconds are dropped and refetched in full
+    - total compressed size is kept under `max_bytes` by evicting least recently used
+    - `stats` counts hits (304s), misses, bytes saved and parses skipped
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=64 * 1024 * 1024, ttl=7 * 24 * 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._index_path = os.path.join(directory, 'index.json')
+        self._dirty = False
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            self._index = {}
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0,
+                      'bytes_saved': 0, 'parses_skipped': 0}
+
+    @staticmethod
+    def _key(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _body_path(self, key):
+        return os.path.join(self.directory, key + '.gz')
+
+    def _entry(self, url):
+        key = self._key(url)
+        entry = self._index.get(key)
+        if entry is None:
+            return key, None
+        if self.ttl is not None and time.time() - entry['stored_at'] > self.ttl:
+            self._drop(key)
+            return key, None
+        return key, entry
+
+    def _drop(self, key):
+        self._index.pop(key, None)
+        self._dirty = True
+        try:
+            os.remove(self._body_path(key))
+        except OSError:
+            pass
+
+    def conditional_headers(self, url):
+        """Return If-None-Match / If-Modified-Since headers for a cached URL ({} if none)."""
+        with self._lock:
+            _, entry = self._entry(url)
+            if entry is None:
+                return {}
+            headers = {}
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+            return headers
+
+    def stored_at(self, url):
+        """
+        When the cached body for url was downloaded (None if not cached).
+        It changes with every new 200, so consumers can tell whether they have
+        already processed the body a 304 hands back.
+        """
+        with self._lock:
+            _, entry = self._entry(url)
+            return None if entry is None else entry['stored_at']
+
+    def not_modified(self, url):
+        """
+        Record a 304 for url and return the cached body text.
+        Returns None if the body is gone (caller should refetch without validators).
+        """
+        with self._lock:
+            key, entry = self._entry(url)
+            if entry is None:
+                return None
+            try:
+                with gzip.open(self._body_path(key), 'rt', encoding='utf-8') as f:
+                    text = f.read()
+            except OSError:
+                self._drop(key)
+                return None
+            entry['last_used'] = time.time()
+            self._dirty = True
+            self.stats['hits'] += 1
+            self.stats['bytes_saved'] += entry['raw_size']
+            return text
+
+    def store(self, url, text, headers):
+        """Save a 200 response body with its validators, then enforce max_bytes."""
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        with self._lock:
+            self.stats['misses'] += 1
+            if not etag and not last_modified:
+                # Nothing to revalidate with; not worth the disk space
+                return
+            key = self._key(url)
+            raw = text.encode('utf-8')
+            body_path = self._body_path(key)
+            tmp_path = body_path + '.tmp'
+            with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+                f.write(raw)
+            os.replace(tmp_path, body_path)
+            now = time.time()
+            self._index[key] = {
+                'url': url,
+                'etag': etag,
+                'last_modified': last_modified,
+                'stored_at': now,
+                'last_used': now,
+                'raw_size': len(raw),
+                'size': os.path.getsize(body_path),
+            }
+            self._dirty = True
+            self.stats['stores'] += 1
+            self._evict()
+
+    def _evict(self):
+        total = sum(e['size'] for e in self._index.values())
+        if total <= self.max_bytes:
+            return
+        for key, entry in sorted(self._index.items(), key=lambda kv: kv[1]['last_used']):
+            self._drop(key)
+            self.stats['evictions'] += 1
+            total -= entry['size']
+            if total <= self.max_bytes:
+                break
+
+    def record_parse_skipped(self):
+        with self._lock:
+            self.stats['parses_skipped'] += 1
+
+    def flush(self):
+        """Write the index to disk if anything changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_path = self._index_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self._index_path)
+            self._dirty = False
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._index):
+                self._drop(key)
+            self.flush()
+
+    def summary(self):
+        s = self.stats
+        return (f"HTTP cache: {s['hits']} not-modified, {s['misses']} downloaded, "
+                f"{s['bytes_saved'] / 1024:.1f} KB saved, {s['parses_skipped']} parses skipped, "
+                f"{s['evictions']} evicted")
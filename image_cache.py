@@ -0,0 +1,318 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from PIL import Image, UnidentifiedImageError
+
+from fetcher import Fetcher
+
+DEFAULT_THUMB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.thumb_cache')
+# Cards are a third of a wide layout; 2x that keeps them sharp on HiDPI screens
+THUMB_WIDTH = 360
+IMAGE_HEADERS = {'Accept': 'image/avif,image/webp,image/*,*/*;q=0.8'}
+# Don't retry a broken image URL on every rerun of the app
+FAILURE_TTL = 15 * 60
+# Product shots are a few MB at most; anything bigger isn't worth downloading
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+# Cache hits only move last_used: write that to index.json at most this often
+FLUSH_INTERVAL = 30
+
+
+class ThumbnailCache:
+    """
+    Card-sized WebP thumbnails of remote product images, kept on disk.
+    Each image URL is downloaded once, shrunk to fit `width` x `width` and stored
+    as <sha256(url)>_<width>.webp; index.json tracks sizes and last use.
+    - total size is kept under `max_bytes` by evicting least recently used
+    - concurrent requests for the same URL wait for a single download
+    - ready() never waits: it returns what is on disk and builds the rest in the background
+    - index.json is written from the background: after a batch of builds, and
+      for hits alone at most every FLUSH_INTERVAL seconds
+    - `stats` counts hits, misses, failures, original and thumbnail bytes
+    """
+
+    def __init__(self, directory=DEFAULT_THUMB_DIR, max_bytes=256 * 1024 * 1024, width=THUMB_WIDTH,
+                 quality=80, fetcher=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.width = width
+        self.quality = quality
+        self.fetcher = fetcher or Fetcher(workers=8, per_host=4, retries=0, timeout=5)
+        self._lock = threading.RLock()
+        self._inflight = {}   # key -> lock held while that URL is being downloaded
+        self._failed = {}     # url -> time of the last failed download
+        self._queued = set()  # urls waiting for a background build
+        self._background = None
+        self._index_path = os.path.join(directory, 'index.json')
+        self._dirty = False
+        self._flushed_at = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            self._index = {}
+        self.stats = {'hits': 0, 'misses': 0, 'failures': 0, 'evictions': 0,
+                      'source_bytes': 0, 'thumb_bytes': 0}
+
+    def _key(self, url):
+        return f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}_{self.width}"
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.webp')
+
+    def _cached(self, key):
+        """Path of a cached thumbnail (marking it used), or None."""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            path = self._path(key)
+            if not os.path.exists(path):
+                self._index.pop(key, None)
+                self._dirty = True
+                return None
+            entry['last_used'] = time.time()
+            self._dirty = True
+            self.stats['hits'] += 1
+            return path
+
+    def thumbnail(self, url):
+        """
+        Local path of the thumbnail for url, downloading and resizing it on first use.
+        Returns None if the image can't be fetched or decoded (caller shows the original).
+        """
+        if not url:
+            return None
+        key = self._key(url)
+        path = self._cached(key)
+        if path is not None:
+            return path
+        with self._lock:
+            failed_at = self._failed.get(url)
+            if failed_at is not None and time.time() - failed_at < FAILURE_TTL:
+                return None
+            inflight = self._inflight.setdefault(key, threading.Lock())
+        with inflight:
+            # Another thread may have finished this URL while we waited
+            path = self._cached(key)
+            if path is None:
+                path = self._build(url, key)
+        with self._lock:
+            self._inflight.pop(key, None)
+        return path
+
+    def thumbnails(self, urls):
+        """Thumbnails for a whole page at once: {url: path or None}, downloads run in parallel."""
+        urls = [u for u in dict.fromkeys(urls) if u]
+        if len(urls) <= 1:
+            return {u: self.thumbnail(u) for u in urls}
+        with ThreadPoolExecutor(max_workers=self.fetcher.workers, thread_name_prefix='thumb') as pool:
+            return dict(zip(urls, pool.map(self.thumbnail, urls)))
+
+    def ready(self, urls):
+        """
+        Thumbnails already on disk: {url: path or None}, without any download.
+        Missing ones are queued for a background build, so the page renders
+        right away (with the original image) and the next view gets thumbnails.
+        """
+        paths = {}
+        missing = []
+        for url in dict.fromkeys(urls):
+            if not url:
+                continue
+            paths[url] = self._cached(self._key(url))
+            if paths[url] is None:
+                missing.append(url)
+        with self._lock:
+            missing = [u for u in missing if u not in self._queued]
+            flush_due = self._dirty and time.monotonic() - self._flushed_at >= FLUSH_INTERVAL
+            if (missing or flush_due) and self._background is None:
+                self._background = ThreadPoolExecutor(max_workers=self.fetcher.workers, thread_name_prefix='thumb')
+            for url in missing:
+                self._queued.add(url)
+                self._background.submit(self._build_queued, url)
+            if flush_due and not self._queued:
+                self._background.submit(self.flush, FLUSH_INTERVAL)
+        return paths
+
+    def _build_queued(self, url):
+        try:
+            self.thumbnail(url)
+        finally:
+            with self._lock:
+                self._queued.discard(url)
+                drained = not self._queued
+            # One write once the page's builds are done, not one per image
+            self.flush(0 if drained else FLUSH_INTERVAL)
+
+    def _download(self, url):
+        # Streamed so an oversized image is dropped after MAX_IMAGE_BYTES, not buffered whole
+        response = self.fetcher.get(url, headers=IMAGE_HEADERS, stream=True)
+        with response:
+            length = response.headers.get('Content-Length')
+            if length and length.isdigit() and int(length) > MAX_IMAGE_BYTES:
+                raise ValueError(f"image is {int(length)} bytes")
+            data = bytearray()
+            for block in response.iter_content(64 * 1024):
+                data += block
+                if len(data) > MAX_IMAGE_BYTES:
+                    raise ValueError(f"image is over {MAX_IMAGE_BYTES} bytes")
+        return bytes(data)
+
+    def _build(self, url, key):
+        try:
+            data = self._download(url)
+            image = Image.open(io.BytesIO(data))
+            # JPEG can decode straight at a reduced scale, far cheaper than a full decode
+            image.draft('RGB', (self.width * 2, self.width * 2))
+            image.thumbnail((self.width, self.width), Image.LANCZOS)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+            out = io.BytesIO()
+            image.save(out, 'WEBP', quality=self.quality, method=4)
+        except (requests.RequestException, UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError):
+            with self._lock:
+                self._failed[url] = time.time()
+                self.stats['failures'] += 1
+            return None
+
+        path = self._path(key)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(out.getvalue())
+        os.replace(tmp_path, path)
+        now = time.time()
+        with self._lock:
+            self._index[key] = {'url': url, 'stored_at': now, 'last_used': now,
+                                'source_size': len(data), 'size': out.tell()}
+            self._dirty = True
+            self.stats['misses'] += 1
+            self.stats['source_bytes'] += len(data)
+            self.stats['thumb_bytes'] += out.tell()
+            self._evict()
+        return path
+
+    def _evict(self):
+        total = sum(e['size'] for e in self._index.values())
+        if total <= self.max_bytes:
+            return
+        for key, entry in sorted(self._index.items(), key=lambda kv: kv[1]['last_used']):
+            self._index.pop(key, None)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            self.stats['evictions'] += 1
+            total -= entry['size']
+            if total <= self.max_bytes:
+                break
+
+    def flush(self, min_interval=0):
+        """Write the index to disk if anything changed, and the last write is `min_interval` seconds old."""
+        with self._lock:
+            if not self._dirty or time.monotonic() - self._flushed_at < min_interval:
+                return
+            tmp_path = self._index_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self._index_path)
+            self._dirty = False
+            self._flushed_at = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._index):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._index = {}
+            self._failed = {}
+            self._dirty = True
+            self.flush()
+
+    def summary(self):
+        s = self.stats
+        return (f"Thumbnails: {s['hits']} cached, {s['misses']} built, {s['failures']} failed, "
+                f"{s['source_bytes'] / 1e6:.1f} MB originals -> {s['thumb_bytes'] / 1e6:.2f} MB thumbnails, "
+                f"{s['evictions']} evicted")
+
+
+# --- SHARED INSTANCE ---
+_default_thumbnails = None
+_default_lock = threading.Lock()
+
+
+def get_thumbnails():
+    """Shared thumbnail cache for every app session in this process."""
+    global _default_thumbnails
+    if _default_thumbnails is None:
+        with _default_lock:
+            if _default_thumbnails is None:
+                _default_thumbnails = ThumbnailCache()
+    return _default_thumbnails
+
+
+# --- BENCHMARK ---
+def _fixture_images(directory, count, size):
+    """Write `count` photo-like JPEGs of size x size (the 'Supersize' product shots)."""
+    import random
+    rng = random.Random(5)
+    for i in range(count):
+        base = Image.radial_gradient('L').resize((size, size))
+        noise = Image.effect_noise((size, size), 40)
+        tint = tuple(rng.randint(60, 255) for _ in range(3))
+        image = Image.merge('RGB', [Image.blend(base, noise, 0.3).point(lambda v, t=t: v * t // 255) for t in tint])
+        image.save(os.path.join(directory, f"product_{i}.jpg"), 'JPEG', quality=92)
+
+
+if __name__ == "__main__":
+    import shutil
+    import sys
+    import tempfile
+
+    from fetcher import serve_fixtures
+
+    # Usage: python image_cache.py [images] [pixels] [latency_seconds]
+    # One results page (12 cards by default) of large JPEGs from a local server:
+    # bytes a browser downloads and time until all card images are ready.
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    work = tempfile.mkdtemp()
+    images_dir = os.path.join(work, 'images')
+    os.makedirs(images_dir)
+    _fixture_images(images_dir, count, size)
+    server, base = serve_fixtures(images_dir, latency)
+    urls = [f"{base}/product_{i}.jpg" for i in range(count)]
+    try:
+        start = time.perf_counter()
+        with Fetcher(workers=8, per_host=8) as fetcher, ThreadPoolExecutor(max_workers=8) as pool:
+            originals = [r.content for r in pool.map(fetcher.get, urls)]
+        direct_ms = (time.perf_counter() - start) * 1000
+        direct_bytes = sum(len(b) for b in originals)
+        print(f"{count} images of {size}x{size}")
+        print(f"{'full-size (today)':24} {direct_bytes / 1e6:8.2f} MB per page view, {direct_ms:7.0f} ms to download")
+
+        cache = ThumbnailCache(os.path.join(work, 'thumbs'))
+        start = time.perf_counter()
+        cache.ready(urls)
+        print(f"{'ready(), cold cache':24} {'':8}    page renders after {(time.perf_counter() - start) * 1000:7.1f} ms "
+              f"(store images, thumbnails build in the background)")
+        for label in ('thumbnails, cold cache', 'thumbnails, warm cache'):
+            start = time.perf_counter()
+            paths = cache.thumbnails(urls)
+            elapsed = (time.perf_counter() - start) * 1000
+            served = sum(os.path.getsize(p) for p in paths.values() if p)
+            print(f"{label:24} {served / 1e6:8.2f} MB per page view, {elapsed:7.0f} ms until ready")
+        cache.flush()
+        print(cache.summary())
+    finally:
+        server.shutdown()
+        shutil.rmtree(work, ignore_errors=True)
@@ -0,0 +1,250 @@
+import re
+import sys
+import time
+
+# Brand names and the product-line words that imply one. Both are dropped from
+# the model words, since stores include or omit them ("Galaxy S23" vs "S23")
+BRAND_ALIASES = {
+    'samsung': 'samsung', 'galaxy': 'samsung',
+    'apple': 'apple', 'iphone': 'apple', 'ipad': 'apple', 'macbook': 'apple', 'airpods': 'apple',
+    'google': 'google', 'pixel': 'google',
+    'xiaomi': 'xiaomi', 'mi': 'xiaomi', 'redmi': 'xiaomi', 'poco': 'xiaomi',
+    'oneplus': 'oneplus', 'nord': 'oneplus',
+    'realme': 'realme', 'narzo': 'realme',
+    'vivo': 'vivo', 'iqoo': 'vivo', 'oppo': 'oppo', 'reno': 'oppo',
+    'motorola': 'motorola', 'moto': 'motorola',
+    'nokia': 'nokia', 'nothing': 'nothing', 'sony': 'sony', 'lg': 'lg', 'hp': 'hp', 'dell': 'dell',
+    'lenovo': 'lenovo', 'asus': 'asus', 'acer': 'acer', 'boat': 'boat', 'boya': 'boya', 'jbl': 'jbl',
+}
+# Variant words: S23, S23 FE and S23 Ultra are different products
+VARIANT_WORDS = {'pro', 'max', 'ultra', 'plus', 'fe', 'mini', 'lite', 'neo', 'prime', 'air', 'edge', 'fold', 'flip', 'se'}
+COLORS = {'black', 'white', 'blue', 'green', 'red', 'silver', 'gold', 'grey', 'gray', 'graphite', 'purple',
+          'pink', 'yellow', 'cream', 'lavender', 'mint', 'titanium', 'midnight', 'starlight', 'obsidian',
+          'porcelain', 'bronze', 'violet', 'orange', 'chrome', 'frost', 'forest', 'glass', 'dark', 'light'}
+NOISE_WORDS = {'5g', '4g', 'lte', 'smartphone', 'mobile', 'phone', 'ai', 'with', 'and', 'the', 'for', 'new',
+               'edition', 'dual', 'sim', 'unlocked', 'india', 'renewed', 'by', 'of', 'in'}
+
+_RAM = re.compile(r'(\d+)\s*gb\s*ram\b')
+_STORAGE = re.compile(r'(\d+)\s*(gb|tb)\b')
+_TOKEN = re.compile(r'[a-z0-9+]+')
+# "S235G" -> "S23" + "5G" (stores glue the network suffix onto the model)
+_GLUED_5G = re.compile(r'^([a-z]*\d+)5g$')
+# Launch years ("Apple 2025 MacBook Air") aren't model numbers
+_YEAR = re.compile(r'^20\d\d$')
+
+# Two titles in one block are the same product if their model words overlap this much
+SIMILARITY_THRESHOLD = 0.6
+
+
+def normalize_title(name):
+    """
+    Split a store title into matching features:
+    {'brand', 'storage' (GB), 'colors': frozenset of colour words,
+     'model': frozenset of model words, 'anchor': the first model word with a digit, in title order}.
+    """
+    text = (name or '').casefold().replace('+', ' plus ')
+    text = _RAM.sub(' ', text)
+    storage = None
+    for amount, unit in _STORAGE.findall(text):
+        gb = int(amount) * (1024 if unit == 'tb' else 1)
+        storage = max(storage or 0, gb)
+    text = _STORAGE.sub(' ', text)
+
+    brand = None
+    colors = set()
+    anchor = None
+    model = set()
+    for token in _TOKEN.findall(text):
+        glued = _GLUED_5G.match(token)
+        if glued:
+            token = glued.group(1)
+        if token in BRAND_ALIASES:
+            brand = brand or BRAND_ALIASES[token]
+            continue
+        if token in NOISE_WORDS:
+            continue
+        if token in COLORS:
+            colors.add(token)
+            continue
+        if anchor is None and any(c.isdigit() for c in token) and not _YEAR.match(token):
+            anchor = token
+        model.add(token)
+    return {'brand': brand or '', 'storage': storage, 'colors': frozenset(colors), 'model': frozenset(model),
+            'anchor': anchor}
+
+
+def block_key(features):
+    """
+    Candidate block: brand + storage + the first model number.
+    The model number comes first in store titles; spec numbers ("1.43 AMOLED",
+    "USB 3.0", "Windows 11") follow it and vary between stores.
+    Only titles sharing a block are ever compared, which keeps matching near-linear.
+    """
+    anchor = features['anchor']
+    if anchor is None:
+        anchor = min(features['model']) if features['model'] else ''
+    return (features['brand'], features['storage'], anchor)
+
+
+def similar(a, b):
+    """Same product? Variant words must agree and the remaining model words mostly overlap."""
+    if (a & VARIANT_WORDS) != (b & VARIANT_WORDS):
+        return False
+    union = len(a | b)
+    return union == 0 or len(a & b) / union >= SIMILARITY_THRESHOLD
+
+
+class ProductMatcher:
+    """
+    Incremental clustering of store listings into products.
+    Listings are blocked by block_key(); inside a block, identical model
+    signatures share a group directly and only distinct signatures are compared.
+    A group holds at most one listing per store: two listings on the same site
+    are different products (or sellers), never offers to compare. Colour is a
+    variant too: a listing never joins a group whose titles name only other
+    colours, but a title without a colour can join any group.
+    """
+
+    def __init__(self):
+        self._blocks = {}       # block key -> {model signature: [group ids]}
+        self._group_of = {}     # listing key -> group id
+        self._members = {}      # group id -> set of listing keys
+        self._sites = {}        # group id -> set of site names in it
+        self._placement = {}    # listing key -> (block key, signature, site, colours)
+        self._next_group = 0
+
+    def add(self, key, name, site=None):
+        """Place one listing (sold on `site`); returns its group id."""
+        if key in self._group_of:
+            self.remove(key)
+        features = normalize_title(name)
+        block = block_key(features)
+        signature = features['model']
+        colors = features['colors']
+        signatures = self._blocks.setdefault(block, {})
+
+        group = self._open_group(signatures.get(signature, ()), site, colors)
+        if group is None:
+            for other, groups in signatures.items():
+                if other != signature and similar(signature, other):
+                    group = self._open_group(groups, site, colors)
+                    if group is not None:
+                        break
+        if group is None:
+            group = self._next_group
+            self._next_group += 1
+        groups = signatures.setdefault(signature, [])
+        if group not in groups:
+            groups.append(group)
+
+        self._group_of[key] = group
+        self._members.setdefault(group, set()).add(key)
+        if site is not None:
+            self._sites.setdefault(group, set()).add(site)
+        self._placement[key] = (block, signature, site, colors)
+        return group
+
+    def _open_group(self, groups, site, colors):
+        # First group without a listing from this site yet, and no listing in another colour
+        for group in groups:
+            if site is not None and site in self._sites.get(group, ()):
+                continue
+            if colors and any(other and not other & colors
+                              for other in (self._placement[k][3] for k in self._members.get(group, ()))):
+                continue
+            return group
+        return None
+
+    def remove(self, key):
+        group = self._group_of.pop(key, None)
+        if group is None:
+            return
+        members = self._members[group]
+        members.discard(key)
+        block, signature, site, _ = self._placement.pop(key)
+        if site is not None:
+            self._sites[group].discard(site)
+        if not any(self._placement[k][1] == signature for k in members):
+            groups = self._blocks[block][signature]
+            groups.remove(group)
+            if not groups:
+                del self._blocks[block][signature]
+        if not members:
+            del self._members[group]
+            self._sites.pop(group, None)
+
+    def group_of(self, key):
+        return self._group_of.get(key)
+
+    def members(self, group):
+        return self._members.get(group, set())
+
+    def groups(self):
+        return self._members
+
+
+def cluster_listings(listings, key=lambda r: id(r)):
+    """
+    Group listings of the same product across stores.
+    Returns a list of groups, each a list of listings with the cheapest first.
+    """
+    matcher = ProductMatcher()
+    by_key = {}
+    for listing in listings:
+        k = key(listing)
+        by_key[k] = listing
+        matcher.add(k, listing.get('name'), listing.get('site_name'))
+    groups = []
+    for members in matcher.groups().values():
+        offers = sorted((by_key[k] for k in members), key=lambda r: r.get('cur_price') or float('inf'))
+        groups.append(offers)
+    groups.sort(key=lambda offers: offers[0].get('cur_price') or float('inf'))
+    return groups
+
+
+# --- BENCHMARK ---
+def _synthetic_listings(n, seed=3):
+    import random
+    rng = random.Random(seed)
+    brands = [('SAMSUNG', 'Galaxy', ['S23', 'S24', 'M06', 'A55', 'F15']), ('Apple', 'iPhone', ['15', '16', '14', '13']),
+              ('Google', 'Pixel', ['8a', '9', '8', '7a']), ('OnePlus', 'Nord', ['CE4', 'CE3', '4']),
+              ('realme', 'Narzo', ['70', '60', '50']), ('Xiaomi', 'Redmi', ['Note 13', 'Note 12', '13C'])]
+    variants = ['', 'Pro', 'Ultra', 'FE', 'Plus', 'Lite']
+    colors = ['Black', 'Blue', 'Graphite', 'Green', 'Silver', 'Cream', 'Purple']
+    storages = [64, 128, 256, 512]
+    sites = ['Amazon', 'Flipkart', 'Croma']
+    listings = []
+    for i in range(n):
+        # Each product is listed once on each store, in that store's title style
+        product = i // len(sites)
+        site = sites[i % len(sites)]
+        rng_p = random.Random(seed * 1_000_003 + product)
+        brand, family, models = rng_p.choice(brands)
+        model = rng_p.choice(models) + (str(rng_p.randint(1, 40)) if rng_p.random() < 0.9 else '')
+        variant = rng_p.choice(variants)
+        color = rng_p.choice(colors)
+        storage = rng_p.choice(storages)
+        if site == 'Flipkart':
+            name = f"{brand.upper()} {family} {model} {variant} ({color}, {storage} GB)"
+        else:
+            name = f"{brand} {model} {variant} 5G {storage}GB {color} Smartphone"
+        listings.append({'name': ' '.join(name.split()), 'site_name': site,
+                         'cur_price': rng.randint(5000, 150000), 'truth': product})
+    return listings
+
+
+if __name__ == "__main__":
+    # Usage: python matching.py [listings]   (default 100k)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    listings = _synthetic_listings(n)
+    start = time.perf_counter()
+    groups = cluster_listings(listings)
+    elapsed = time.perf_counter() - start
+
+    truth_groups = {}
+    for listing in listings:
+        truth_groups.setdefault(listing['truth'], set()).add(id(listing))
+    exact = sum(1 for g in groups if {id(r) for r in g} in truth_groups.values())
+    cross_store = sum(1 for g in groups if len({r['site_name'] for r in g}) > 1)
+    print(f"{n:,} listings -> {len(groups):,} products in {elapsed:.2f}s ({n / elapsed:,.0f} listings/s)")
+    print(f"{cross_store:,} products offered by more than one store; {exact:,} groups match the generator's products exactly")
@@ -0,0 +1,288 @@
+import bisect
+import collections
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+# Latency buckets in seconds (Prometheus histogram `le` bounds)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PREFIX = 'price_tracker'
+
+
+class _Timer:
+    """Context manager / decorator that records one stage duration."""
+
+    __slots__ = ('registry', 'stage', 'start')
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.stage, time.perf_counter() - self.start)
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Timer(self.registry, self.stage):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+class Metrics:
+    """
+    In-process stage timers and counters.
+    - timer(stage) records a duration histogram per stage (count, sum, max, buckets)
+    - count(name, n) bumps a counter (records extracted, fallback hits, ...)
+    - to_prometheus() / to_json() export everything; both are cheap enough to scrape often
+    Set enabled=False (or PRICE_TRACKER_METRICS=0) to turn every call into a no-op.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stages = {}     # stage -> [count, sum, max, bucket counts...]
+        self._counters = collections.Counter()
+        self.started_at = time.time()
+
+    def timer(self, stage):
+        return _Timer(self, stage)
+
+    def observe(self, stage, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            row = self._stages.get(stage)
+            if row is None:
+                row = self._stages[stage] = [0, 0.0, 0.0] + [0] * (len(BUCKETS) + 1)
+            row[0] += 1
+            row[1] += seconds
+            if seconds > row[2]:
+                row[2] = seconds
+            row[3 + bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] += n
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self.started_at = time.time()
+
+    def snapshot(self):
+        """Plain-dict view: {'stages': {stage: {...}}, 'counters': {...}}."""
+        with self._lock:
+            stages = {}
+            for stage, row in self._stages.items():
+                count, total, longest = row[0], row[1], row[2]
+                stages[stage] = {'count': count, 'sum_s': round(total, 6), 'max_s': round(longest, 6),
+                                 'mean_ms': round(total / count * 1000, 3) if count else 0.0,
+                                 'p50_ms': _quantile_ms(row[3:], count, 0.5, longest),
+                                 'p95_ms': _quantile_ms(row[3:], count, 0.95, longest)}
+            return {'uptime_s': round(time.time() - self.started_at, 1), 'stages': stages,
+                    'counters': dict(self._counters)}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            stages = {k: list(v) for k, v in self._stages.items()}
+            counters = dict(self._counters)
+        lines = [f"# HELP {PREFIX}_stage_seconds Time spent per pipeline/search stage.",
+                 f"# TYPE {PREFIX}_stage_seconds histogram"]
+        for stage in sorted(stages):
+            row = stages[stage]
+            cumulative = 0
+            for bound, n in zip(BUCKETS + (float('inf'),), row[3:]):
+                cumulative += n
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{stage}"}} {row[1]:.6f}')
+            lines.append(f'{PREFIX}_stage_seconds_count{{stage="{stage}"}} {row[0]}')
+        for name in sorted(counters):
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            lines.append(f"{PREFIX}_{name}_total {counters[name]}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Write to_json() (or to_prometheus() for *.prom / *.txt) to a file."""
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json()
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def summary(self):
+        """Short human-readable table, slowest stages first."""
+        snap = self.snapshot()
+        lines = ["Stage timings:"]
+        for stage, s in sorted(snap['stages'].items(), key=lambda kv: -kv[1]['sum_s']):
+            lines.append(f"  {stage:16} {s['count']:7} calls  total {s['sum_s'] * 1000:10.1f} ms  "
+                         f"mean {s['mean_ms']:8.2f} ms  p95 <= {s['p95_ms']:8.2f} ms  max {s['max_s'] * 1000:8.1f} ms")
+        if snap['counters']:
+            lines.append("Counters: " + ', '.join(f"{k}={v}" for k, v in sorted(snap['counters'].items())))
+        return '\n'.join(lines)
+
+
+def _quantile_ms(buckets, count, q, longest):
+    # Upper bound of the bucket holding the q-th observation (histograms can't do better).
+    # Past the last bound the slowest observation is the only finite answer (and JSON has no Infinity)
+    if not count:
+        return 0.0
+    target = q * count
+    seen = 0
+    for bound, n in zip(BUCKETS, buckets):
+        seen += n
+        if seen >= target:
+            return min(bound, longest) * 1000
+    return round(longest * 1000, 3)
+
+
+# --- SHARED REGISTRY ---
+METRICS = Metrics(enabled=os.environ.get('PRICE_TRACKER_METRICS', '1') != '0')
+
+
+def timer(stage):
+    """`with timer('parse'):` or `@timer('parse')` on the shared registry."""
+    return METRICS.timer(stage)
+
+
+def count(name, n=1):
+    METRICS.count(name, n)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_http_server(port, registry=METRICS):
+    """
+    Serve /metrics (Prometheus text) and /metrics.json from a background thread.
+    Safe to call on every Streamlit rerun: only the first call starts a server.
+    """
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith('/metrics.json'):
+                body, content_type = registry.to_json().encode('utf-8'), 'application/json'
+            elif self.path.startswith('/metrics'):
+                body, content_type = registry.to_prometheus().encode('utf-8'), 'text/plain; version=0.0.4'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(('127.0.0.1', int(port)), MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name='metrics', daemon=True).start()
+        return _server
+
+
+# --- SAMPLING PROFILER ---
+class SamplingProfiler:
+    """
+    Low-overhead wall-clock profiler: a background thread samples every thread's
+    stack every `interval` seconds. Nothing is traced between samples, so it can
+    stay on under real load. Output is in collapsed-stack format
+    ("frame;frame;frame count"), which flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampler', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, 'thread'))
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return '\n'.join(f"{stack} {n}" for stack, n in self.samples.most_common()) + '\n'
+
+    def top(self, limit=15):
+        """Functions by self time (share of samples where they were on top of the stack)."""
+        own = collections.Counter()
+        for stack, n in self.samples.items():
+            own[stack.rsplit(';', 1)[-1]] += n
+        total = sum(own.values()) or 1
+        return [(fn, n * 100.0 / total) for fn, n in own.most_common(limit)]
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.collapsed())
+
+
+@contextlib.contextmanager
+def profiling(path=None, interval=0.005):
+    """
+    Sample the enclosed block and write collapsed stacks to `path`.
+    `path` defaults to $PRICE_TRACKER_PROFILE; with neither set this does nothing.
+    """
+    path = path or os.environ.get('PRICE_TRACKER_PROFILE')
+    if not path:
+        yield None
+        return
+    profiler = SamplingProfiler(interval).start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        profiler.write(path)
@@ -1,213 +1,152 @@
 import json
-import re
+import logging
+import os
 import csv
-from bs4 import BeautifulSoup
+import sys
 import requests  # For live fetching
+from fallback_extract import extract_records
+from fetcher import Fetcher
+from http_cache import HttpCache
+from metrics import METRICS, SamplingProfiler, count, timer
+from price_history import PriceHistory
+from snapshot_diff import SNAPSHOT_PATH, write_incremental
+from svelte_extract import JSLiteralError, extract_kit_data, pick_sections
+
+# Parser diagnostics (run with --verbose to see them); stage timings and counters go to metrics.py
+log = logging.getLogger('parse_html')
 
 # Primary: Fetch LIVE complete HTML from Buyhatke
 url = 'https://buyhatke.com'
-headers = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-    'Accept-Language': 'en-US,en;q=0.5',
-    'Accept-Encoding': 'gzip, deflate',
-    'Connection': 'keep-alive',
-    'Upgrade-Insecure-Requests': '1'
-}
-try:
-    print("Fetching live HTML from Buyhatke...")
-    response = requests.get(url, headers=headers, timeout=10)
-    response.raise_for_status()
-    html_content = response.text
-    # SAVE FULL HTML TO FILE for offline use/verification
-    with open('homepage.html', 'w', encoding='utf-8') as f:
-        f.write(html_content)
-    print(f"SUCCESS: Fetched and saved full HTML to homepage.html. Length: {len(html_content)} chars")
-    print(f"Contains 'iPhone 15'? {'iPhone 15' in html_content}")
-    print(f"Contains 'serviceWorker'? {'serviceWorker' in html_content}")
-    print(f"Contains 'trendingProducts'? {'trendingProducts' in html_content}")  # Key data check
-except requests.RequestException as e:
-    print(f"Live fetch failed: {e}. Falling back to local file 'homepage.html'.")
+
+
+def fetch_homepage(page_url=url, cache=None, fallback_path='homepage.html'):
+    """
+    Fetch the live Buyhatke HTML (conditional GET when a cache is given) and save it
+    to fallback_path; if the fetch fails, load the last saved copy instead.
+    Returns (html, not_modified).
+    """
     try:
-        with open('homepage.html', 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        print(f"Fallback: Loaded file. Length: {len(html_content)} chars")
-    except FileNotFoundError:
-        raise ValueError("No 'homepage.html' file found. Run live fetch first or create it manually.")
-    except Exception as file_e:
-        raise ValueError(f"File loading failed: {file_e}")
+        print("Fetching live HTML from Buyhatke...")
+        # Pooled session with retry/backoff (see fetcher.py for multi-page fetching)
+        with Fetcher(workers=1, timeout=10, cache=cache) as fetcher:
+            result = fetcher.fetch(page_url)
+        if not result.ok:
+            raise requests.RequestException(result.error)
+        html_content = result.text
+        if result.not_modified:
+            print(f"NOT MODIFIED: Buyhatke returned 304, reusing cached HTML. Length: {len(html_content)} chars")
+            return html_content, True
+        # SAVE FULL HTML TO FILE for offline use/verification
+        with open(fallback_path, 'w', encoding='utf-8') as f:
+            f.write(html_content)
+        print(f"SUCCESS: Fetched and saved full HTML to {fallback_path}. Length: {len(html_content)} chars")
+        print(f"Contains 'iPhone 15'? {'iPhone 15' in html_content}")
+        print(f"Contains 'serviceWorker'? {'serviceWorker' in html_content}")
+        print(f"Contains 'trendingProducts'? {'trendingProducts' in html_content}")  # Key data check
+        return html_content, False
+    except requests.RequestException as e:
+        print(f"Live fetch failed: {e}. Falling back to local file '{fallback_path}'.")
+        try:
+            with open(fallback_path, 'r', encoding='utf-8') as f:
+                html_content = f.read()
+            print(f"Fallback: Loaded file. Length: {len(html_content)} chars")
+            return html_content, False
+        except FileNotFoundError:
+            raise ValueError(f"No '{fallback_path}' file found. Run live fetch first or create it manually.")
+        except Exception as file_e:
+            raise ValueError(f"File loading failed: {file_e}")
 
 def parse_buyhatke_html(html_str):
     """
     Parse the Buyhatke HTML and extract embedded JSON data.
-    Dynamically finds SvelteKit script (handles changing hashes).
+    Finds the SvelteKit kit.start(...) payload by substring scan (handles changing
+    hashes) and parses its JS object literal in one pass - no DOM, no regex rewriting.
     Returns a dictionary with key sections like trendingProducts, etc.
     """
-    soup = BeautifulSoup(html_str, 'lxml')
-    
-    # Find ALL script tags for debug
-    all_scripts = soup.find_all('script')
-    print("DEBUG: Found {} script tags in total.".format(len(all_scripts)))
-    
-    # DYNAMIC FINDER: Look for SvelteKit script by patterns (not hardcoded ID)
-    # Patterns: Contains 'sveltekit', 'kit.start', 'node_ids', and 'data: ['
-    script_tag = None
-    for script in all_scripts:
-        script_text = script.string or ''
-        if script_text and re.search(r'sveltekit.*kit\.start.*node_ids.*data:\s*\[', script_text, re.DOTALL | re.IGNORECASE):
-            script_tag = script
-            print("DEBUG: Found SvelteKit script (dynamic match). Length:", len(script_text))
-            break
-    
-    if not script_tag:
-        print("DEBUG: No exact SvelteKit script found. Falling back to text search for data patterns.")
-        script_content = html_str  # Use full HTML for fallback extraction
-    else:
-        script_content = script_tag.string
-        print("DEBUG: First 500 chars of script:")
-        print(script_content[:500])
-        print("-" * 50)
-    
-    # IMPROVED REGEX: Capture the FULL data array (greedy, handles dynamic structure)
-    # Look for 'data: [' ... '], form:' or end of object
-    data_match = re.search(r'data:\s*(\[[\s\S]*?)\]\s*,\s*form:', script_content, re.DOTALL)
-    
-    if not data_match:
-        # Alternative: To end of kit.start object
-        data_match = re.search(r'data:\s*(\[[\s\S]*?)\]\s*(?=\s*form|\s*\};|\s*\)\);)', script_content, re.DOTALL)
-    
-    if not data_match:
-        # Last resort: Largest array starting with 'data: ['
-        data_match = re.search(r'data:\s*(\[[\s\S]{1000,}\])', script_content, re.DOTALL)  # Min 1000 chars for full data
-    
-    if not data_match:
-        print("DEBUG: No full data array found via regex. Using text-based fallback extraction.")
-        return extract_from_text_fallback(script_content)  # See fallback function below
-    
-    data_str = data_match.group(1).strip()
-    print("DEBUG: Captured data string length:", len(data_str))  # Should be 5000+
-    print("DEBUG: First 300 chars of data:", repr(data_str[:300]))
-    print("DEBUG: Last 200 chars of data:", repr(data_str[-200:]))
-    
     try:
-        # ENHANCED CLEANING: Convert JS to valid JSON (improved for delimiter issues)
-        # 1. Quote unquoted keys (e.g., type: -> "type":)
-        data_str = re.sub(r'([a-zA-Z_$][a-zA-Z0-9_$]*)\s*:', r'"\1":', data_str)
-        # 2. Quote unquoted string values (e.g., : Flipkart -> : "Flipkart")
-        data_str = re.sub(r':\s*([a-zA-Z_$][a-zA-Z0-9_$]*)(?=\s*[,}\]]|$)', r': "\1"', data_str)
-        # 3. Remove trailing commas more aggressively
-        data_str = re.sub(r',\s*([}\]])', r'\1', data_str)
-        data_str = re.sub(r',\s*(?=[}\]])', '', data_str)  # Remove lone commas before close
-        # 4. Fix booleans/null (keep as is for JSON)
-        data_str = data_str.replace('true', 'true').replace('false', 'false').replace('null', 'null')
-        # 5. Clean newlines/escapes and fix delimiters
-        data_str = re.sub(r'\\n|\\t', ' ', data_str)
-        data_str = re.sub(r'\s*,\s*,\s*', ',', data_str)  # Fix double commas
-        
-        # Ensure array format
-        if not data_str.startswith('['):
-            data_str = '[' + data_str + ']'
-        data_str = data_str.rstrip(',')  # Final trim
-        
-        parsed_data = json.loads(data_str)
-        print("DEBUG: Successfully parsed FULL data array. Number of items:", len(parsed_data))
-        
-        # Extract key sections (main data at index 2 or scan all)
-        extracted = {}
-        for item in parsed_data:
-            if isinstance(item, dict) and 'data' in item:
-                sub_data = item['data']
-                if isinstance(sub_data, dict):
-                    for key in ['trendingProducts', 'exclusiveDealsProducts', 'features', 'supportedStoresFeatureInfo', 'referral']:
-                        if key in sub_data:
-                            extracted[key] = sub_data[key]
-        
-        if extracted:
-            print("DEBUG: Full extraction successful. Keys found:", list(extracted.keys()))
-            return extracted
-        
-        raise ValueError("No key sections found in parsed data.")
-    
-    except json.JSONDecodeError as e:
-        print(f"Full JSON parsing error: {e}")
-        print("DEBUG: Using text-based fallback extraction...")
-        return extract_from_text_fallback(script_content)
+        parsed_data = extract_kit_data(html_str)
+    except JSLiteralError as e:
+        count('parse_failures')
+        log.warning("Full data parsing error: %s. Using text-based fallback extraction.", e)
+        return extract_from_text_fallback(html_str)
+
+    if parsed_data is None:
+        log.debug("No SvelteKit data array found. Using text-based fallback extraction.")
+        return extract_from_text_fallback(html_str)
+
+    log.debug("Successfully parsed FULL data array. Number of items: %d", len(parsed_data))
+    extracted = pick_sections(parsed_data)
+    if extracted:
+        log.debug("Full extraction successful. Keys found: %s", list(extracted.keys()))
+        _count_records(extracted)
+        return extracted
+
+    log.debug("No key sections found in parsed data. Using text-based fallback extraction.")
+    return extract_from_text_fallback(html_str)
 
 def extract_from_text_fallback(text_content):
     """
-    Fallback: Extract data directly from HTML text using regex (no BeautifulSoup needed).
-    Pulls all products/deals even if script tag is missed.
+    Fallback: Extract data directly from HTML text (no DOM needed).
+    Pulls all products/deals even if the SvelteKit payload is missed.
+    Uses the precompiled record scanner in fallback_extract.py.
     """
-    extracted = {
-        'trendingProducts': [],
-        'exclusiveDealsProducts': [],
-        'features': {}
-    }
-    
-    # Extract trendingProducts (full pattern for all fields)
-    trending_pattern = r'name\s*:\s*"([^"]*)"\s*,\s*image\s*:\s*"([^"]*)"\s*,\s*link\s*:\s*"([^"]*)"\s*,\s*cur_price\s*:\s*(\d+)\s*,\s*last_price\s*:\s*(\d+)\s*,\s*price_drop_per\s*:\s*(\d+)\s*,\s*date\s*:\s*"([^"]*)"\s*,\s*site_name\s*:\s*"([^"]*)"\s*,\s*site_logo\s*:\s*"([^"]*)"\s*,\s*site_pos\s*:\s*(\d+)\s*,\s*internalPid\s*:\s*(\d+)\s*,\s*rating\s*:\s*([\d.]+)\s*,\s*ratingCount\s*:\s*(\d+)'
-    trending_matches = re.findall(trending_pattern, text_content, re.DOTALL | re.MULTILINE)
-    
-    for match in trending_matches:
-        product = {
-            'name': match[0],
-            'image': match[1],
-            'link': match[2],
-            'cur_price': int(match[3]),
-            'last_price': int(match[4]),
-            'price_drop_per': int(match[5]),
-            'date': match[6],
-            'site_name': match[7],
-            'site_logo': match[8],
-            'site_pos': int(match[9]),
-            'internalPid': int(match[10]),
-            'rating': float(match[11]),
-            'ratingCount': int(match[12])
-        }
-        extracted['trendingProducts'].append(product)
-    
-    # IMPROVED FALLBACK for exclusiveDealsProducts (tweaked regex for live structure, includes optional fields)
-    deals_pattern = r'name\s*:\s*"([^"]*)"\s*,\s*(?:image\s*:\s*"([^"]*)"\s*,\s*)?(?:link\s*:\s*"([^"]*)"\s*,\s*)?cur_price\s*:\s*(\d+)\s*,\s*last_price\s*:\s*(\d+)\s*,\s*price_drop_per\s*:\s*(\d+)\s*,\s*(?:date\s*:\s*"([^"]*)"\s*,\s*)?site_name\s*:\s*"([^"]*)"\s*,\s*(?:site_logo\s*:\s*"([^"]*)"\s*,\s*)?(?:site_pos\s*:\s*(\d+)\s*,\s*)?internalPid\s*:\s*(\d+)\s*,\s*(?:rating\s*:\s*(-?\d+)\s*,\s*)?ratingCount\s*:\s*(\d+)\s*,\s*score\s*:\s*(\d+)'
-    deals_matches = re.findall(deals_pattern, text_content, re.DOTALL | re.MULTILINE)
-    
-    for match in deals_matches:
-        deal = {
-            'name': match[0],
-            'image': match[1] if len(match) > 1 and match[1] else None,
-            'link': match[2] if len(match) > 2 and match[2] else None,
-            'cur_price': int(match[3]),
-            'last_price': int(match[4]),
-            'price_drop_per': int(match[5]),
-            'date': match[6] if len(match) > 6 and match[6] else None,
-            'site_name': match[7],
-            'site_logo': match[8] if len(match) > 8 and match[8] else None,
-            'site_pos': int(match[9]) if len(match) > 9 and match[9] else None,
-            'internalPid': int(match[10]),
-            'rating': int(match[11]) if len(match) > 11 and match[11] and match[11] != '-1' else None,
-            'ratingCount': int(match[12]),
-            'score': int(match[13])
-        }
-        extracted['exclusiveDealsProducts'].append(deal)
-    
-    # Extract features (key-value pairs like spendButtonClicked: 218)
-    features_pattern = r'([a-zA-Z]+(?:[A-Z][a-zA-Z]*)*)\s*:\s*(\d+)'
-    features_matches = re.findall(features_pattern, text_content, re.MULTILINE)
-    for key, value in features_matches:
-        if key in ['spendButtonClicked', 'GraphClicked', 'AutoCouponClicked', 'DittoOpened', 'WatchPriceClicked', 'CompareBarNewHovered']:  # Known keys
-            extracted['features'][key] = int(value)
-    
-    print(f"DEBUG: Fallback extracted {len(extracted['trendingProducts'])} products, {len(extracted['exclusiveDealsProducts'])} deals, and {len(extracted['features'])} features.")
+    count('fallback_hits')
+    with timer('fallback'):
+        extracted = extract_records(text_content)
+    log.debug("Fallback extracted %d products, %d deals, and %d features.",
+              len(extracted['trendingProducts']), len(extracted['exclusiveDealsProducts']), len(extracted['features']))
+    _count_records(extracted)
     return extracted
 
+def _count_records(extracted):
+    count('records_extracted', len(extracted.get('trendingProducts') or []) + len(extracted.get('exclusiveDealsProducts') or []))
+
 # Run the parser
 if __name__ == "__main__":
+    # --incremental: emit only added/changed/removed listings to output.delta.jsonl
+    # instead of rewriting output.json and products.csv
+    incremental = '--incremental' in sys.argv
+    # --verbose: parser diagnostics; --metrics FILE: stage timings as JSON (.prom for Prometheus text);
+    # --profile FILE: sampled stacks in collapsed format (or set PRICE_TRACKER_PROFILE)
+    logging.basicConfig(level=logging.DEBUG if '--verbose' in sys.argv else logging.WARNING,
+                        format='%(levelname)s: %(message)s')
+    metrics_path = sys.argv[sys.argv.index('--metrics') + 1] if '--metrics' in sys.argv[:-1] else None
+    profile_path = (sys.argv[sys.argv.index('--profile') + 1] if '--profile' in sys.argv[:-1]
+                    else os.environ.get('PRICE_TRACKER_PROFILE'))
+    profiler = SamplingProfiler().start() if profile_path else None
+    # Conditional-GET cache: an unchanged page costs a 304 instead of a full download + parse
+    http_cache = HttpCache()
+    html_content, html_not_modified = fetch_homepage(url, http_cache)
+    previous_output = SNAPSHOT_PATH if incremental else 'output.json'
+    # A 304 hands back the cached body; skip only if the output was written after that
+    # body was downloaded (a run that failed after the download left the output stale)
+    cached_at = http_cache.stored_at(url)
+    if (html_not_modified and cached_at is not None and os.path.exists(previous_output)
+            and os.path.getmtime(previous_output) >= cached_at):
+        # Page unchanged since the last run: output.json / products.csv are already current
+        http_cache.record_parse_skipped()
+        print("SKIPPED: Page not modified, keeping existing output.json and products.csv")
+        print(http_cache.summary())
+        raise SystemExit(0)
+
     try:
         extracted_data = parse_buyhatke_html(html_content)
+        listings = extracted_data.get('trendingProducts', []) + extracted_data.get('exclusiveDealsProducts', [])
         
-        # Save full extracted data to JSON
-        with open('output.json', 'w', encoding='utf-8') as f:
-            json.dump(extracted_data, f, indent=4, ensure_ascii=False)
-        print("SUCCESS: Full data saved to output.json")
+        with timer('persist'):
+            if incremental:
+                delta = write_incremental(listings)
+                print(f"SUCCESS: Delta #{delta['seq']}: {len(delta['added'])} added, {len(delta['changed'])} changed, {len(delta['removed'])} removed (output.delta.jsonl)")
+            else:
+                # Save full extracted data to JSON
+                with open('output.json', 'w', encoding='utf-8') as f:
+                    json.dump(extracted_data, f, indent=4, ensure_ascii=False)
+                print("SUCCESS: Full data saved to output.json")
+
+            # Append price changes to the local history (one batched transaction)
+            with PriceHistory() as history:
+                changed = history.record_batch(listings)
+        print(f"SUCCESS: {changed} price changes recorded in price_history.db")
         
         # Print summary
         print("\n=== EXTRACTED DATA SUMMARY ===")
@@ -245,7 +184,7 @@ if __name__ == "__main__":
                 print(f"- {key}: {value}")
         
         # FIXED CSV: Include ALL fields from fallback (no more fieldnames error)
-        if 'trendingProducts' in extracted_data and extracted_data['trendingProducts']:
+        if not incremental and 'trendingProducts' in extracted_data and extracted_data['trendingProducts']:
             fields = ['name', 'cur_price', 'last_price', 'price_drop_per', 'site_name', 'rating', 'ratingCount', 'link', 'image', 'date', 'internalPid', 'site_pos', 'site_logo']
             with open('products.csv', 'w', newline='', encoding='utf-8') as f:
                 writer = csv.DictWriter(f, fieldnames=fields)
@@ -254,6 +193,13 @@ if __name__ == "__main__":
             print("\nSUCCESS: Trending products exported to products.csv (open in Excel)")
         
         print("\n=== DONE! Check output.json, homepage.html, and products.csv ===")
+        print(http_cache.summary())
+        print(METRICS.summary())
+        if metrics_path:
+            METRICS.write(metrics_path)
+        if profiler:
+            profiler.stop().write(profile_path)
+            print(f"Profile: {sum(profiler.samples.values())} samples written to {profile_path}")
     
     except Exception as e:
         print(f"ERROR: {e}")
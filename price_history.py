@@ -0,0 +1,210 @@
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'price_history.db')
+DAY = 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    internal_pid INTEGER NOT NULL,
+    site_name TEXT NOT NULL,
+    name TEXT,
+    link TEXT,
+    last_cur_price INTEGER,
+    last_seen INTEGER,
+    UNIQUE (internal_pid, site_name)
+);
+-- One row per price change; (product, time) is the clustered key
+CREATE TABLE IF NOT EXISTS observations (
+    product_id INTEGER NOT NULL REFERENCES products(id),
+    observed_at INTEGER NOT NULL,
+    cur_price INTEGER NOT NULL,
+    last_price INTEGER,
+    price_drop_per INTEGER,
+    PRIMARY KEY (product_id, observed_at)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS observations_time ON observations (observed_at);
+"""
+
+
+def start_of_day(ts=None):
+    """Local midnight for ts (default now), as epoch seconds."""
+    t = time.localtime(time.time() if ts is None else ts)
+    return int(time.mktime((t.tm_year, t.tm_mon, t.tm_mday, 0, 0, 0, 0, 0, -1)))
+
+
+class PriceHistory:
+    """
+    Append-only price history in SQLite (WAL mode).
+    Products are keyed by (internalPid, site_name); an observation row is only
+    written when a product's price differs from the last one recorded.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(_SCHEMA)
+        self._latest = None  # (internal_pid, site_name) -> [product_id, last_cur_price]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _load_latest(self):
+        if self._latest is None:
+            rows = self.conn.execute('SELECT internal_pid, site_name, id, last_cur_price FROM products')
+            self._latest = {(pid, site): [pk, price] for pid, site, pk, price in rows}
+        return self._latest
+
+    # --- INGESTION ---
+    def record_batch(self, records, observed_at=None):
+        """
+        Record one scrape's products in a single transaction.
+        Records without internalPid/site_name/cur_price are skipped.
+        Returns the number of price changes written.
+        """
+        observed_at = int(time.time() if observed_at is None else observed_at)
+        with self._lock:
+            latest = self._load_latest()
+            new_products = {}
+            changes = []   # (key, record, cur_price)
+            for r in records:
+                pid, site, price = r.get('internalPid'), r.get('site_name'), r.get('cur_price')
+                if pid is None or not site or price is None:
+                    continue
+                key = (int(pid), site)
+                price = int(price)
+                known = latest.get(key)
+                if known is None:
+                    new_products[key] = r
+                elif known[1] == price:
+                    continue
+                changes.append((key, r, price))
+
+            if not changes:
+                return 0
+            with self.conn:
+                if new_products:
+                    max_id = self.conn.execute('SELECT COALESCE(MAX(id), 0) FROM products').fetchone()[0]
+                    self.conn.executemany(
+                        'INSERT OR IGNORE INTO products (internal_pid, site_name) VALUES (?, ?)',
+                        list(new_products))
+                    for pid, site, pk in self.conn.execute(
+                            'SELECT internal_pid, site_name, id FROM products WHERE id > ?', (max_id,)):
+                        latest[(pid, site)] = [pk, None]
+                self.conn.executemany(
+                    'UPDATE products SET name = ?, link = ?, last_seen = ?, last_cur_price = ? WHERE id = ?',
+                    [(r.get('name'), r.get('link'), observed_at, price, latest[key][0]) for key, r, price in changes])
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO observations (product_id, observed_at, cur_price, last_price, price_drop_per) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    [(latest[key][0], observed_at, price, r.get('last_price'), r.get('price_drop_per'))
+                     for key, r, price in changes])
+            for key, _, price in changes:
+                latest[key][1] = price
+            return len(changes)
+
+    # --- QUERIES ---
+    def _product_id(self, internal_pid, site_name):
+        row = self.conn.execute('SELECT id FROM products WHERE internal_pid = ? AND site_name = ?',
+                                (int(internal_pid), site_name)).fetchone()
+        return row[0] if row else None
+
+    def history(self, internal_pid, site_name, since=0):
+        """[(observed_at, cur_price)] for one product, oldest first."""
+        product_id = self._product_id(internal_pid, site_name)
+        if product_id is None:
+            return []
+        return self.conn.execute(
+            'SELECT observed_at, cur_price FROM observations WHERE product_id = ? AND observed_at >= ? '
+            'ORDER BY observed_at', (product_id, int(since))).fetchall()
+
+    def lowest_price(self, internal_pid, site_name, days=90, now=None):
+        """
+        Lowest price in the last `days` days, or None if never seen.
+        Includes the price in effect when the window opened (only changes are stored).
+        """
+        product_id = self._product_id(internal_pid, site_name)
+        if product_id is None:
+            return None
+        since = int((time.time() if now is None else now) - days * DAY)
+        row = self.conn.execute(
+            'SELECT MIN(cur_price) FROM ('
+            '  SELECT cur_price FROM observations WHERE product_id = ? AND observed_at >= ?'
+            '  UNION ALL'
+            '  SELECT * FROM (SELECT cur_price FROM observations WHERE product_id = ? AND observed_at < ?'
+            '                 ORDER BY observed_at DESC LIMIT 1))',
+            (product_id, since, product_id, since)).fetchone()
+        return row[0]
+
+    def drops_since(self, min_drop_per=20, since=None):
+        """
+        Products whose current price is at least `min_drop_per`% below the price
+        they had at `since` (default: local midnight today). Biggest drops first.
+        """
+        since = start_of_day() if since is None else int(since)
+        rows = self.conn.execute(
+            'SELECT p.internal_pid, p.site_name, p.name, b.cur_price, p.last_cur_price '
+            'FROM (SELECT DISTINCT product_id FROM observations WHERE observed_at >= ?) c '
+            'JOIN products p ON p.id = c.product_id '
+            'JOIN observations b ON b.product_id = c.product_id AND b.observed_at = ('
+            '    SELECT MAX(observed_at) FROM observations WHERE product_id = c.product_id AND observed_at < ?) '
+            'WHERE b.cur_price > 0 AND p.last_cur_price <= b.cur_price * (1 - ? / 100.0)',
+            (since, since, float(min_drop_per))).fetchall()
+        results = [
+            {'internalPid': pid, 'site_name': site, 'name': name, 'price_before': before,
+             'cur_price': now, 'drop_per': round((before - now) * 100 / before, 1)}
+            for pid, site, name, before, now in rows
+        ]
+        results.sort(key=lambda r: r['drop_per'], reverse=True)
+        return results
+
+
+# --- BENCHMARK ---
+if __name__ == "__main__":
+    import random
+    import sys
+    import tempfile
+
+    # Usage: python price_history.py [products] [days]   (default 20k products x 100 days)
+    n_products = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    rng = random.Random(1)
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    store = PriceHistory(path)
+    prices = [rng.randint(5000, 150000) for _ in range(n_products)]
+    t0 = start_of_day() - days * DAY
+
+    start = time.perf_counter()
+    for day in range(days + 1):
+        batch = []
+        for i in range(n_products):
+            if rng.random() < 0.5:  # about half the prices move each day
+                prices[i] = max(100, int(prices[i] * rng.uniform(0.7, 1.2)))
+            batch.append({'internalPid': i, 'site_name': 'Amazon' if i % 2 else 'Flipkart',
+                          'name': f"Product {i}", 'cur_price': prices[i]})
+        store.record_batch(batch, observed_at=t0 + day * DAY + 3600)
+    ingest = time.perf_counter() - start
+    rows = store.conn.execute('SELECT COUNT(*) FROM observations').fetchone()[0]
+    print(f"Ingested {rows:,} observations ({n_products:,} products x {days + 1} scrapes) in {ingest:.1f}s")
+
+    start = time.perf_counter()
+    for i in range(1000):
+        store.lowest_price(i, 'Amazon' if i % 2 else 'Flipkart', days=90)
+    print(f"lowest_price (90 days): {(time.perf_counter() - start):.3f} ms per query (avg of 1000)")
+
+    start = time.perf_counter()
+    drops = store.drops_since(20)
+    print(f"drops_since(20%, today): {len(drops):,} products in {(time.perf_counter() - start) * 1000:.1f} ms")
+    store.close()
@@ -1,5 +1,10 @@
+import argparse
 import json
+import os
+import sys
 import webbrowser
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 def show_cheapest_product(filename):
     try:
@@ -38,5 +43,172 @@ def show_cheapest_product(filename):
     except Exception as e:
         print(f"⚠️ Error: {e}")
 
+# --- BATCH MODE (non-interactive) ---
+def _offer(item, source):
+    # Both schemas we see: title/store/price and the scraper's name/site_name/cur_price
+    if not isinstance(item, dict):
+        return None
+    price = item.get("price", item.get("cur_price"))
+    if not isinstance(price, (int, float)) or isinstance(price, bool):
+        return None
+    return {
+        "title": _text(item.get("title")) or _text(item.get("name")) or "Unknown Product",
+        "store": _text(item.get("store")) or _text(item.get("site_name")) or "Unknown Store",
+        "price": price,
+        "link": item.get("link"),
+        "file": source,
+    }
+
+
+def _text(value):
+    # Titles and stores become dict keys: anything but a non-blank string is missing
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+
+def _better(current, offer):
+    return current is None or offer["price"] < current["price"]
+
+
+def summarize_file(filename):
+    """
+    Cheapest offers in one JSON file, per product title and per store.
+    Understands the same shapes as show_cheapest_product ("cheapest" or "results"),
+    plus plain lists and the scraper's output.json (trending products and deals).
+    Runs in a worker process, so it returns plain data and never raises.
+    """
+    summary = {"file": filename, "cheapest": None, "products": {}, "stores": {}, "error": None}
+    try:
+        with open(filename, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        summary["error"] = str(e)
+        return summary
+
+    if isinstance(data, dict) and "cheapest" in data:
+        items = [data["cheapest"]] + _list(data.get("results"))
+    elif isinstance(data, dict) and "results" in data:
+        items = _list(data["results"])
+    elif isinstance(data, dict) and ("trendingProducts" in data or "exclusiveDealsProducts" in data):
+        # parse_html.py's output.json
+        items = _list(data.get("trendingProducts")) + _list(data.get("exclusiveDealsProducts"))
+    elif isinstance(data, list):
+        items = data
+    elif isinstance(data, dict) and "price" in data:
+        items = [data]  # a single saved offer, like cheapest.json
+    else:
+        summary["error"] = "No valid data found in JSON."
+        return summary
+
+    for item in items:
+        offer = _offer(item, filename)
+        if offer is None:
+            continue
+        if _better(summary["cheapest"], offer):
+            summary["cheapest"] = offer
+        title_key = offer["title"].casefold()
+        if _better(summary["products"].get(title_key), offer):
+            summary["products"][title_key] = offer
+        if _better(summary["stores"].get(offer["store"]), offer):
+            summary["stores"][offer["store"]] = offer
+    if summary["cheapest"] is None:
+        summary["error"] = "No priced items found in JSON."
+    return summary
+
+
+def _list(value):
+    return value if isinstance(value, list) else []
+
+
+def iter_json_files(paths):
+    """Yield .json files from the given files and directories (recursively)."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.endswith(".json"):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def _summarize_chunk(filenames):
+    return [summarize_file(filename) for filename in filenames]
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _summaries(pool, filenames, window, chunksize=16):
+    """Summaries in input order, with at most `window` chunks submitted at a time."""
+    pending = deque()
+    for chunk in _chunks(filenames, chunksize):
+        pending.append(pool.submit(_summarize_chunk, chunk))
+        if len(pending) >= window:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
+def batch_cheapest(paths, out, workers=None):
+    """
+    Summarize many product files in parallel and write JSON Lines to `out`:
+    one {"type": "file"} line per input as it completes, then the overall
+    {"type": "product"} and {"type": "store"} cheapest offers.
+    Returns the number of files that failed.
+    """
+    products, stores = {}, {}
+    failed = 0
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Files are fed a few chunks ahead of the workers (pool.map would list a
+        # whole directory tree up front) and reduced as results stream back
+        for summary in _summaries(pool, iter_json_files(paths), window=workers * 2):
+            out.write(json.dumps({"type": "file", "file": summary["file"], "cheapest": summary["cheapest"],
+                                  "error": summary["error"]}, ensure_ascii=False) + "\n")
+            if summary["error"]:
+                failed += 1
+            for key, offer in summary["products"].items():
+                if _better(products.get(key), offer):
+                    products[key] = offer
+            for key, offer in summary["stores"].items():
+                if _better(stores.get(key), offer):
+                    stores[key] = offer
+
+    for offer in sorted(products.values(), key=lambda o: o["title"].casefold()):
+        out.write(json.dumps({"type": "product", **offer}, ensure_ascii=False) + "\n")
+    for offer in sorted(stores.values(), key=lambda o: o["store"]):
+        out.write(json.dumps({"type": "store", **offer}, ensure_ascii=False) + "\n")
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the cheapest product in scraped JSON files.")
+    parser.add_argument("paths", nargs="*", default=["products.json"], help="JSON files or directories")
+    parser.add_argument("--batch", action="store_true", help="non-interactive: write JSON Lines for all inputs")
+    parser.add_argument("-o", "--output", help="JSON Lines output file (default: stdout)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    if not args.batch:
+        for path in args.paths:
+            show_cheapest_product(path)
+        return 0
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            failed = batch_cheapest(args.paths, out, args.workers)
+    else:
+        failed = batch_cheapest(args.paths, sys.stdout, args.workers)
+    return 1 if failed else 0
+
+
 if __name__ == "__main__":
-    show_cheapest_product("products.json")
+    sys.exit(main())
@@ -0,0 +1,549 @@
+import json
+import logging
+import os
+import queue
+import random
+import signal
+import sys
+import threading
+import time
+
+from fetcher import Fetcher
+from http_cache import HttpCache
+from metrics import METRICS, count, profiling, start_http_server, timer
+from parse_html import parse_buyhatke_html
+from price_history import DEFAULT_DB_PATH, PriceHistory
+from snapshot_diff import DELTA_PATH, SNAPSHOT_PATH, load_snapshot, record_key, write_incremental
+
+JOBS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scrape_jobs.json')
+DEFAULT_JOBS = [{'url': 'https://buyhatke.com', 'interval': 30 * 60, 'jitter': 5 * 60}]
+# Failed jobs retry sooner than their interval: 1, 2, 4 ... minutes, capped at the interval
+RETRY_BASE = 60
+
+log = logging.getLogger('scrape_daemon')
+
+
+# --- CLOCKS ---
+class SystemClock:
+    """Wall-clock time; sleeping wakes early when `stop` is set."""
+
+    virtual = False
+
+    def now(self):
+        return time.time()
+
+    def sleep(self, seconds, stop):
+        stop.wait(max(0.0, seconds))
+
+
+class FakeClock:
+    """Virtual time for offline runs: sleep() just moves the clock forward."""
+
+    virtual = True
+
+    def __init__(self, start=0.0):
+        self._now = float(start)
+        self._lock = threading.Lock()
+
+    def now(self):
+        with self._lock:
+            return self._now
+
+    def sleep(self, seconds, stop):
+        with self._lock:
+            self._now += max(0.0, seconds)
+
+
+# --- JOB QUEUE ---
+class Job:
+    """One URL scraped every `interval` seconds (+/- `jitter`)."""
+
+    def __init__(self, url, interval=30 * 60, jitter=0, next_run=0.0, last_run=None, failures=0,
+                 last_status=None, keys=None, cached_at=None):
+        self.url = url
+        self.interval = float(interval)
+        self.jitter = float(jitter)
+        self.next_run = float(next_run or 0.0)
+        self.last_run = last_run
+        self.failures = int(failures)
+        self.last_status = last_status
+        self.keys = list(keys or [])  # record keys this URL contributed to the snapshot
+        self.cached_at = cached_at    # HttpCache.stored_at() of the body those keys came from
+
+    def to_dict(self):
+        return {'url': self.url, 'interval': self.interval, 'jitter': self.jitter, 'next_run': self.next_run,
+                'last_run': self.last_run, 'failures': self.failures, 'last_status': self.last_status,
+                'keys': self.keys, 'cached_at': self.cached_at}
+
+    def __repr__(self):
+        return f"Job({self.url!r}, interval={self.interval:.0f}, next_run={self.next_run:.0f}, failures={self.failures})"
+
+
+class JobStore:
+    """
+    Scrape jobs persisted to a JSON file, so schedules and retry state survive restarts.
+    Jobs are keyed by URL; save() rewrites the file atomically. Other processes
+    (main()'s --add/--remove while a daemon runs) may edit the file too: reload()
+    merges their changes, and save() reloads first so it never drops them.
+    """
+
+    def __init__(self, path=JOBS_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self.jobs = {}
+        self._synced = {}   # url -> (interval, jitter) as of the last read or write of the file
+        self._stamp = None  # the file's (inode, mtime, size) at that point
+        self.reload()
+
+    def add(self, url, interval=30 * 60, jitter=0):
+        """Add a job or change the schedule of an existing one."""
+        with self._lock:
+            job = self.jobs.get(url)
+            if job is None:
+                job = self.jobs[url] = Job(url, interval, jitter)
+            else:
+                job.interval, job.jitter = float(interval), float(jitter)
+            return job
+
+    def remove(self, url):
+        with self._lock:
+            self.jobs.pop(url, None)
+
+    def due(self, now, exclude=()):
+        """Jobs whose next_run has passed, oldest first."""
+        with self._lock:
+            jobs = [j for j in self.jobs.values() if j.next_run <= now and j.url not in exclude]
+        return sorted(jobs, key=lambda j: j.next_run)
+
+    def next_run(self, exclude=()):
+        with self._lock:
+            times = [j.next_run for j in self.jobs.values() if j.url not in exclude]
+        return min(times) if times else None
+
+    def reload(self):
+        """
+        Merge jobs added, removed or rescheduled in the file since we last read
+        or wrote it; run state (next_run, failures, ...) stays ours. Only a stat
+        when the file hasn't changed. Returns True if the file was read.
+        """
+        with self._lock:
+            stamp = self._file_stamp()
+            if stamp is None or stamp == self._stamp:
+                return False
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    theirs = {}
+                    for raw in json.load(f).get('jobs', []):
+                        job = Job(**raw)
+                        theirs[job.url] = job
+            except (OSError, ValueError, TypeError, AttributeError):
+                return False
+            for url in set(self._synced) - set(theirs):
+                self.jobs.pop(url, None)  # removed elsewhere
+            for url, job in theirs.items():
+                mine = self.jobs.get(url)
+                schedule = (job.interval, job.jitter)
+                if mine is None:
+                    if url not in self._synced:
+                        self.jobs[url] = job  # added elsewhere (else: removed here since)
+                elif schedule != self._synced.get(url):
+                    mine.interval, mine.jitter = schedule  # rescheduled elsewhere
+            self._synced = {url: (j.interval, j.jitter) for url, j in theirs.items()}
+            self._stamp = stamp
+            return True
+
+    def save(self):
+        with self._lock:
+            self.reload()
+            data = {'jobs': [j.to_dict() for j in self.jobs.values()]}
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+            self._synced = {url: (j.interval, j.jitter) for url, j in self.jobs.items()}
+            self._stamp = self._file_stamp()
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+# --- DAEMON ---
+class ScrapeDaemon:
+    """
+    Scheduler plus a three-stage pipeline: fetch -> parse -> persist.
+    - `workers` fetch threads share one Fetcher (pooled, retrying, conditional GETs)
+    - one parse thread and one persist thread (single writer for SQLite and the delta log)
+    - stages are joined by bounded queues: when persisting falls behind, parsing
+      and then fetching block, and the scheduler stops dispatching (backpressure)
+    - a job is never queued twice; its next run is scheduled when it completes
+    - persisting writes the snapshot/delta files the app's catalog tails, so a running
+      app picks up new prices on its next query; `on_persist(delta, listings)` is called
+      after every write with changes
+    - stop() (or SIGINT/SIGTERM from main()) lets queued jobs drain, then exits
+    """
+
+    def __init__(self, jobs, workers=4, queue_size=None, clock=None, fetcher=None, cache=None,
+                 history_path=DEFAULT_DB_PATH, snapshot_path=SNAPSHOT_PATH, delta_path=DELTA_PATH,
+                 on_persist=None, seed=None):
+        self.jobs = jobs
+        self.workers = max(1, int(workers))
+        queue_size = queue_size or self.workers * 2
+        self.clock = clock or SystemClock()
+        self.cache = cache if cache is not None else HttpCache()
+        self.fetcher = fetcher or Fetcher(workers=self.workers, per_host=2, retries=2, cache=self.cache)
+        self.history_path = history_path
+        self.snapshot_path = snapshot_path
+        self.delta_path = delta_path
+        self.on_persist = on_persist
+        self._rng = random.Random(seed)
+
+        self._fetch_queue = queue.Queue(maxsize=queue_size)
+        self._parse_queue = queue.Queue(maxsize=queue_size)
+        self._persist_queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._idle = threading.Condition()
+        self._in_flight = set()
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self.stats = {'dispatched': 0, 'fetched': 0, 'not_modified': 0, 'fetch_errors': 0,
+                      'parsed': 0, 'parse_errors': 0, 'persisted': 0, 'changes': 0, 'price_changes': 0,
+                      'hook_errors': 0}
+
+    # --- SCHEDULER ---
+    def run(self, duration=None):
+        """
+        Dispatch due jobs until stop() is called (or `duration` seconds of clock
+        time have passed), then shut the pipeline down cleanly.
+        """
+        self._start_stages()
+        start = self.clock.now()
+        end = None if duration is None else start + duration
+        try:
+            while not self._stop.is_set():
+                now = self.clock.now()
+                if end is not None and now >= end:
+                    break
+                self.jobs.reload()  # jobs added with --add while we run
+                for job in self.jobs.due(now, exclude=self._in_flight_urls()):
+                    if not self._dispatch(job):
+                        break
+                if self.clock.virtual:
+                    # Virtual time only moves once the pipeline has caught up
+                    self.wait_idle()
+                next_run = self.jobs.next_run(exclude=self._in_flight_urls())
+                wake = now + 1 if next_run is None else next_run
+                if end is not None:
+                    wake = min(wake, end)
+                delay = wake - self.clock.now()
+                if not self.clock.virtual:
+                    delay = min(delay, 1.0)  # notice completed jobs and stop() promptly
+                self.clock.sleep(delay, self._stop)
+        finally:
+            self.shutdown()
+
+    def run_once(self):
+        """Run every job once right away, wait for all of them, then shut down."""
+        self._start_stages()
+        try:
+            for job in list(self.jobs.jobs.values()):
+                if not self._dispatch(job):
+                    break
+            self.wait_idle()
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        self._stop.set()
+
+    def wait_idle(self):
+        """Block until no job is anywhere in the pipeline."""
+        with self._idle:
+            while self._in_flight:
+                self._idle.wait()
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            self.stats[name] += n
+
+    def _in_flight_urls(self):
+        with self._idle:
+            return set(self._in_flight)
+
+    def _dispatch(self, job):
+        with self._idle:
+            self._in_flight.add(job.url)
+        self._count('dispatched')
+        while not self._stop.is_set():
+            try:
+                self._fetch_queue.put(job, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        self._finish(job, None, 'not started (shutdown)')
+        return False
+
+    def _finish(self, job, ok, status):
+        """Schedule a job's next run once it leaves the pipeline (ok=None: not run)."""
+        now = self.clock.now()
+        if ok:
+            job.failures = 0
+            job.last_run = now
+            jitter = self._rng.uniform(-job.jitter, job.jitter) if job.jitter else 0.0
+            job.next_run = now + max(1.0, job.interval + jitter)
+        elif ok is False:
+            job.failures += 1
+            job.next_run = now + min(job.interval, RETRY_BASE * 2 ** (job.failures - 1))
+        job.last_status = status
+        try:
+            self.jobs.save()
+        except OSError:
+            log.exception("could not save %s", self.jobs.path)
+        finally:
+            with self._idle:
+                self._in_flight.discard(job.url)
+                self._idle.notify_all()
+
+    # --- PIPELINE STAGES ---
+    def _start_stages(self):
+        self._stop.clear()
+        self._threads = (
+            [self._spawn(self._fetch_stage, f"fetch-{i}") for i in range(self.workers)],
+            [self._spawn(self._parse_stage, 'parse')],
+            [self._spawn(self._persist_stage, 'persist')],
+        )
+
+    @staticmethod
+    def _spawn(target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        return thread
+
+    def _fetch_stage(self):
+        while True:
+            job = self._fetch_queue.get()
+            if job is None:
+                return
+            try:
+                result = self.fetcher.fetch(job.url)
+                # The cache keeps a 200's body before it is parsed and persisted. A 304
+                # only means "nothing to do" if this job persisted that very body; after
+                # a failed parse/persist the cached copy is processed like a fresh one.
+                cached_at = self.cache.stored_at(job.url) if result.ok else None
+            except Exception as e:
+                # e.g. the HTTP cache can't write its file: fail this run, keep the thread
+                log.exception("fetch failed for %s", job.url)
+                self._count('fetch_errors')
+                self._finish(job, False, f"fetch failed: {e}")
+                continue
+            if not result.ok:
+                self._count('fetch_errors')
+                self._finish(job, False, f"fetch failed: {result.error}")
+                continue
+            if result.not_modified and cached_at is not None and cached_at == job.cached_at:
+                self._count('not_modified')
+                self.cache.record_parse_skipped()
+                self._finish(job, True, 'not modified')
+            else:
+                self._count('fetched')
+                self._parse_queue.put((job, result.text, cached_at))
+
+    def _parse_stage(self):
+        while True:
+            item = self._parse_queue.get()
+            if item is None:
+                return
+            job, html, cached_at = item
+            try:
+                extracted = parse_buyhatke_html(html)
+            except Exception as e:
+                self._count('parse_errors')
+                self._finish(job, False, f"parse failed: {e}")
+                continue
+            self._count('parsed')
+            listings = extracted.get('trendingProducts', []) + extracted.get('exclusiveDealsProducts', [])
+            self._persist_queue.put((job, listings, cached_at))
+
+    def _persist_stage(self):
+        # Everything every job last produced, keyed like the snapshot
+        current = dict(load_snapshot(self.snapshot_path).get('records', {}))
+        with PriceHistory(self.history_path) as history:
+            while True:
+                item = self._persist_queue.get()
+                if item is None:
+                    return
+                job, listings, cached_at = item
+                try:
+                    with timer('persist'):
+                        keys = [record_key(r) for r in listings]
+                        for key in set(job.keys) - set(keys):
+                            current.pop(key, None)  # this page no longer lists it
+                        current.update(zip(keys, listings))
+                        job.keys = list(dict.fromkeys(keys))
+                        delta = write_incremental(list(current.values()), self.snapshot_path, self.delta_path)
+                        changes = len(delta['added']) + len(delta['changed']) + len(delta['removed'])
+                        price_changes = history.record_batch(listings, observed_at=self.clock.now())
+                except Exception as e:
+                    self._finish(job, False, f"persist failed: {e}")
+                    continue
+                job.cached_at = cached_at
+                self._count('persisted')
+                self._count('changes', changes)
+                self._count('price_changes', price_changes)
+                status = f"ok: {len(listings)} listings, {changes} changes"
+                if changes and self.on_persist is not None:
+                    # The data is already written; a failing hook (alert sink, ...)
+                    # must not take the persist thread down with it
+                    try:
+                        self.on_persist(delta, listings)
+                    except Exception as e:
+                        log.exception("on_persist failed for %s", job.url)
+                        self._count('hook_errors')
+                        count('persist_hook_errors')
+                        status += f", on_persist failed: {e}"
+                self._finish(job, True, status)
+
+    def shutdown(self):
+        """Stop dispatching, drain queued work stage by stage, then flush state."""
+        self._stop.set()
+        if not self._threads:
+            return
+        fetchers, parsers, persisters = self._threads
+        for stage_queue, threads in ((self._fetch_queue, fetchers), (self._parse_queue, parsers),
+                                     (self._persist_queue, persisters)):
+            for _ in threads:
+                stage_queue.put(None)
+            for thread in threads:
+                thread.join()
+        self._threads = []
+        self.fetcher.close()
+        self.jobs.save()
+
+    def summary(self):
+        s = self.stats
+        return (f"Scrape daemon: {s['dispatched']} runs, {s['fetched']} fetched, {s['not_modified']} not modified, "
+                f"{s['fetch_errors']} fetch errors, {s['parsed']} parsed, {s['parse_errors']} parse errors, "
+                f"{s['persisted']} persisted ({s['changes']} listing changes, {s['price_changes']} price changes), "
+                f"{s['hook_errors']} hook errors")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Scrape on a schedule: fetch -> parse -> persist.")
+    parser.add_argument('--jobs', default=JOBS_PATH, help="job file (default: scrape_jobs.json)")
+    parser.add_argument('--add', metavar='URL', help="add or reschedule a job, then exit")
+    parser.add_argument('--remove', metavar='URL', help="remove a job, then exit")
+    parser.add_argument('--interval', type=float, default=30 * 60, help="seconds between runs (with --add)")
+    parser.add_argument('--jitter', type=float, default=5 * 60, help="random +/- seconds per run (with --add)")
+    parser.add_argument('--workers', type=int, default=4, help="fetch threads")
+    parser.add_argument('--once', action='store_true', help="run every job once, then exit")
+    parser.add_argument('--alerts', action='store_true', help="check watch rules (alerts.db) after every scrape")
+    parser.add_argument('--webhook', metavar='URL', help="with --alerts: also POST fired alerts here")
+    parser.add_argument('--metrics-port', type=int, help="serve /metrics and /metrics.json on this port")
+    parser.add_argument('--profile', metavar='FILE', help="write sampled stacks (collapsed format) on exit")
+    args = parser.parse_args(argv)
+
+    store = JobStore(args.jobs)
+    if args.add or args.remove:
+        if args.add:
+            print(f"Scheduled: {store.add(args.add, args.interval, args.jitter)}")
+        if args.remove:
+            store.remove(args.remove)
+            print(f"Removed: {args.remove}")
+        store.save()
+        return 0
+    if not store.jobs:
+        for job in DEFAULT_JOBS:
+            store.add(**job)
+
+    daemon = ScrapeDaemon(store, workers=args.workers)
+    if args.alerts:
+        from alerts import AlertEngine, FileSink, WebhookSink
+        sinks = [FileSink()] + ([WebhookSink(args.webhook)] if args.webhook else [])
+        daemon.on_persist = AlertEngine(sinks=sinks).on_persist
+        print("Alerts: matching watch rules after each scrape (alerts.jsonl)")
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+        print(f"Metrics: http://127.0.0.1:{args.metrics_port}/metrics")
+
+    def request_stop(signum, frame):
+        print("Stopping: finishing queued jobs...")
+        daemon.stop()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    print(f"Scraping {len(store.jobs)} job(s) with {daemon.workers} workers; Ctrl+C to stop")
+    with profiling(args.profile):
+        if args.once:
+            daemon.run_once()
+        else:
+            daemon.run()
+    print(daemon.summary())
+    print(daemon.cache.summary())
+    print(METRICS.summary())
+    return 0
+
+
+# --- OFFLINE RUN ---
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] == '--offline':
+    import shutil
+    import tempfile
+
+    from alerts import AlertEngine, AlertRules, FileSink, WebhookSink, serve_webhook_stub
+    from fetcher import serve_fixtures
+
+    # Usage: python scrape_daemon.py --offline [hours] [latency_seconds]
+    # A simulated day of scraping against the saved pages in fixtures/: fake clock,
+    # local server, everything written to a temp directory.
+    hours = float(sys.argv[2]) if len(sys.argv) > 2 else 24
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.01
+    here = os.path.dirname(os.path.abspath(__file__))
+    fixtures = os.path.join(here, 'fixtures')
+    work = tempfile.mkdtemp()
+    server, base = serve_fixtures(fixtures, latency)
+    webhook, webhook_url, received = serve_webhook_stub()
+    try:
+        store = JobStore(os.path.join(work, 'jobs.json'))
+        for i, name in enumerate(sorted(n for n in os.listdir(fixtures) if n.endswith('.html'))):
+            store.add(f"{base}/{name}", interval=(15 + 15 * i) * 60, jitter=120)
+        store.add(f"{base}/missing.html", interval=3600)  # always 404: exercises retry backoff
+        # Watch every product on the saved homepage: at today's price, and for a 10% drop
+        with open(os.path.join(fixtures, 'buyhatke_home.html'), 'r', encoding='utf-8') as f:
+            home = parse_buyhatke_html(f.read())
+        rules = AlertRules(os.path.join(work, 'alerts.db'))
+        rules.add_many((p['internalPid'], p['cur_price'] + 1, 10, None, 'offline@example.com')
+                       for p in home.get('trendingProducts', []))
+        engine = AlertEngine(rules, [FileSink(os.path.join(work, 'alerts.jsonl')), WebhookSink(webhook_url)])
+        persisted = []
+
+        def on_persist(delta, listings):
+            persisted.append(delta['seq'])
+            engine.on_persist(delta, listings)
+
+        daemon = ScrapeDaemon(store, workers=4, clock=FakeClock(start=1_700_000_000),
+                              cache=HttpCache(os.path.join(work, 'http_cache')),
+                              history_path=os.path.join(work, 'history.db'),
+                              snapshot_path=os.path.join(work, 'snapshot.json'),
+                              delta_path=os.path.join(work, 'delta.jsonl'),
+                              on_persist=on_persist, seed=1)
+        start = time.perf_counter()
+        daemon.run(duration=hours * 3600)
+        elapsed = time.perf_counter() - start
+        print(f"Simulated {hours:g}h in {elapsed:.2f}s")
+        print(daemon.summary())
+        print(daemon.cache.summary())
+        print(f"Delta log entries: {persisted}")
+        print(f"Alerts: {len(rules.rules())} rules, {len(received)} alerts delivered to the webhook stub")
+        print(METRICS.summary())
+        for job in JobStore(store.path).jobs.values():
+            print(f"  {job.url.rsplit('/', 1)[-1]:34} failures={job.failures} status={job.last_status}")
+    finally:
+        server.shutdown()
+        webhook.shutdown()
+        shutil.rmtree(work, ignore_errors=True)
+elif __name__ == "__main__":
+    sys.exit(main())
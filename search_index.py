@@ -0,0 +1,273 @@
+import heapq
+import re
+import sys
+import time
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Prefixes longer than this share one posting list; candidates are then verified
+# against the full token so long query words still match exactly.
+MAX_PREFIX = 8
+
+
+def tokenize(text):
+    """Case-fold and split a product name into alphanumeric tokens."""
+    return TOKEN_RE.findall(text.casefold())
+
+
+class SearchIndex:
+    """
+    Inverted index over product names.
+    Every token is posted under each of its prefixes (up to MAX_PREFIX chars),
+    so "s23 ult" finds "SAMSUNG S23 ULTRA 5G" without touching other products.
+    Token trigrams back the substring fallback for mid-word queries ("23 ult").
+    Results are ranked by relevance, with the cheaper product winning ties.
+    """
+
+    def __init__(self, products=()):
+        self._docs = []       # doc_id -> product dict (None once removed)
+        self._tokens = []     # doc_id -> tuple of name tokens
+        self._folded = []     # doc_id -> case-folded name, for the substring fallback
+        self._static = []     # doc_id -> (token count, price): query-independent rank part
+        self._postings = {}   # prefix -> list of doc_ids
+        self._exact = {}      # whole token -> list of doc_ids
+        self._trigrams = {}   # trigram inside a token -> list of doc_ids
+        self._removed = 0
+        self._stale = []      # removed doc ids still sitting in posting lists
+        self._free = []       # removed doc ids purged from every posting list, ready for reuse
+        for product in products:
+            self.add(product)
+
+    def __len__(self):
+        return len(self._docs) - self._removed
+
+    # --- UPDATES ---
+    def add(self, product):
+        """Index one product and return its doc id (a freed slot when there is one)."""
+        name = product.get('name') or ''
+        tokens = tuple(tokenize(name))
+        static = (len(tokens), product.get('cur_price') or 0)
+        if self._free:
+            doc_id = self._free.pop()
+            self._docs[doc_id] = product
+            self._tokens[doc_id] = tokens
+            self._folded[doc_id] = name.casefold()
+            self._static[doc_id] = static
+            self._removed -= 1
+        else:
+            doc_id = len(self._docs)
+            self._docs.append(product)
+            self._tokens.append(tokens)
+            self._folded.append(name.casefold())
+            self._static.append(static)
+
+        prefixes = set()
+        trigrams = set()
+        for token in tokens:
+            for i in range(1, min(len(token), MAX_PREFIX) + 1):
+                prefixes.add(token[:i])
+            for i in range(len(token) - 2):
+                trigrams.add(token[i:i + 3])
+        _post(self._postings, prefixes, doc_id)
+        _post(self._exact, set(tokens), doc_id)
+        _post(self._trigrams, trigrams, doc_id)
+        return doc_id
+
+    def remove(self, doc_id):
+        """
+        Drop a product from results. Posting lists are compacted lazily;
+        doc ids of live products never change, so callers may keep them as keys.
+        A removed id is handed out again by add() once compaction has purged it.
+        """
+        if self._docs[doc_id] is None:
+            return
+        self._docs[doc_id] = None
+        self._tokens[doc_id] = ()
+        self._folded[doc_id] = ''
+        self._removed += 1
+        self._stale.append(doc_id)
+        if len(self._stale) > 1000 and len(self._stale) > len(self):
+            self._compact()
+
+    def update(self, doc_id, product):
+        """Replace a product; returns its doc id, which may differ (other ids are unaffected)."""
+        self.remove(doc_id)
+        return self.add(product)
+
+    def _compact(self):
+        # Purge removed ids from the posting lists; every live doc keeps its id and
+        # the purged slots are reused by add(), so the arrays stop growing
+        docs = self._docs
+        for postings in (self._postings, self._exact, self._trigrams):
+            for key in list(postings):
+                bucket = [d for d in postings[key] if docs[d] is not None]
+                if bucket:
+                    postings[key] = bucket
+                else:
+                    del postings[key]
+        self._free.extend(self._stale)
+        self._stale = []
+
+    # --- QUERIES ---
+    def _prefix_ids(self, query_tokens):
+        lists = []
+        for qt in query_tokens:
+            bucket = self._postings.get(qt[:MAX_PREFIX])
+            if not bucket:
+                return set()
+            lists.append(bucket)
+        candidates = _intersect(lists)
+
+        long_tokens = [qt for qt in query_tokens if len(qt) > MAX_PREFIX]
+        if long_tokens and candidates:
+            tokens = self._tokens
+            candidates = {
+                d for d in candidates
+                if all(any(t.startswith(qt) for t in tokens[d]) for qt in long_tokens)
+            }
+        return candidates
+
+    def _substring_ids(self, folded_query, query_tokens):
+        # Mid-word queries ("23 ultra") aren't word prefixes; keep the old
+        # substring semantics for them. Every query word must sit inside one
+        # name token, so its trigrams narrow the candidates before the check.
+        lists = []
+        for qt in query_tokens:
+            for i in range(len(qt) - 2):
+                bucket = self._trigrams.get(qt[i:i + 3])
+                if not bucket:
+                    return set()
+                lists.append(bucket)
+        folded = self._folded
+        if lists:
+            candidates = _intersect(lists)
+        else:
+            # Only 1-2 character words: nothing to narrow on
+            candidates = range(len(folded))
+        return {d for d in candidates if folded_query in folded[d]}
+
+    def match(self, query):
+        """Return the set of doc ids matching query (unranked)."""
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return set()
+        ids = self._prefix_ids(query_tokens)
+        if not ids:
+            ids = self._substring_ids(query.casefold().strip(), query_tokens)
+        if self._removed:
+            docs = self._docs
+            ids = {d for d in ids if docs[d] is not None}
+        return ids
+
+    def count(self, query):
+        return len(self.match(query))
+
+    def _rank_key(self, query):
+        # Score = number of query words that are whole tokens of the name.
+        # Ties go to shorter (more specific) names, then the lower price.
+        exact_sets = [set(self._exact.get(qt, ())) for qt in set(tokenize(query))]
+        exact_sets = [e for e in exact_sets if e]
+        static = self._static
+        if exact_sets:
+            def key(d):
+                return (-sum(d in e for e in exact_sets), static[d], d)
+        else:
+            def key(d):
+                return (static[d], d)
+        return key
+
+    def search_ids(self, query, limit=None, offset=0):
+        """Return (total_matches, ranked doc ids for [offset, offset + limit))."""
+        ids = self.match(query)
+        total = len(ids)
+        key = self._rank_key(query)
+        if limit is None:
+            ranked = sorted(ids, key=key)[offset:]
+        else:
+            ranked = heapq.nsmallest(offset + limit, ids, key=key)[offset:]
+        return total, ranked
+
+    def iter_ranked(self, query, ids=None):
+        """
+        Yield doc ids in search_ids() order, ranking lazily: heapify once, then
+        pop, so a caller that stops after k results pays O(n + k log n).
+        `ids` restricts the ranking to those docs (default: all matches).
+        """
+        key = self._rank_key(query)
+        heap = [(key(d), d) for d in (self.match(query) if ids is None else ids)]
+        heapq.heapify(heap)
+        while heap:
+            yield heapq.heappop(heap)[1]
+
+    def search(self, query, limit=None, offset=0):
+        """Return ranked product dicts for query."""
+        _, ranked = self.search_ids(query, limit, offset)
+        return [self._docs[d] for d in ranked]
+
+    def get(self, doc_id):
+        return self._docs[doc_id]
+
+    def documents(self):
+        """All products by doc id (None for removed ones)."""
+        return self._docs
+
+
+def _post(postings, keys, doc_id):
+    for key in keys:
+        bucket = postings.get(key)
+        if bucket is None:
+            postings[key] = [doc_id]
+        else:
+            bucket.append(doc_id)
+
+
+def _intersect(lists):
+    lists = sorted(lists, key=len)
+    result = set(lists[0])
+    for bucket in lists[1:]:
+        if not result:
+            break
+        result.intersection_update(bucket)
+    return result
+
+
+# --- BENCHMARK ---
+def _synthetic_products(n):
+    import random
+    rng = random.Random(42)
+    brands = ['SAMSUNG', 'APPLE', 'ONEPLUS', 'XIAOMI', 'REALME', 'VIVO', 'OPPO', 'MOTOROLA', 'NOKIA', 'GOOGLE']
+    lines = ['S23', 'S24', 'GALAXY', 'IPHONE', 'NORD', 'REDMI', 'NARZO', 'PIXEL', 'EDGE', 'RENO']
+    tags = ['ULTRA', 'PRO', 'FE', 'PLUS', 'MAX', 'LITE', '5G', 'NEO', 'MINI', '']
+    colors = ['Black', 'Blue', 'Graphite', 'Green', 'Silver', 'Cream']
+    storage = ['64 GB', '128 GB', '256 GB', '512 GB']
+    sites = ['Amazon', 'Flipkart']
+    products = []
+    for i in range(n):
+        name = f"{rng.choice(brands)} {rng.choice(lines)}{rng.randint(1, 99)} {rng.choice(tags)} ({rng.choice(colors)}, {rng.choice(storage)})"
+        products.append({'name': name, 'cur_price': rng.randint(5000, 150000), 'site_name': rng.choice(sites)})
+    return products
+
+
+def _bench(sizes, queries=('s23 ultra', 'samsung', 'pixel7 pro', 'graphite 256', 'nothing here')):
+    for n in sizes:
+        products = _synthetic_products(n)
+        start = time.perf_counter()
+        index = SearchIndex(products)
+        build = time.perf_counter() - start
+        print(f"\n=== {n:,} products (index build {build:.2f}s) ===")
+        for q in queries:
+            # Current app.py path: lowercase every name on every query
+            start = time.perf_counter()
+            scan = [p for p in products if q.lower() in p.get('name', '').lower()]
+            scan_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            total, top = index.search_ids(q, limit=30)
+            index_ms = (time.perf_counter() - start) * 1000
+            print(f"{q!r:16} scan: {scan_ms:9.2f} ms ({len(scan)} hits) | index top-30: {index_ms:8.2f} ms ({total} hits)")
+
+
+if __name__ == "__main__":
+    # Usage: python search_index.py [size ...]   (default 1k, 100k, 1M)
+    sizes = [int(a) for a in sys.argv[1:]] or [1_000, 100_000, 1_000_000]
+    _bench(sizes)
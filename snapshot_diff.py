@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import re
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_PATH = os.path.join(BASE_DIR, 'output.snapshot.json')
+DELTA_PATH = os.path.join(BASE_DIR, 'output.delta.jsonl')
+_SEQ = re.compile(rb'"seq"\s*:\s*(\d+)')
+# The snapshot holds everything; the delta log only has to carry what a running
+# reader may not have applied yet. Past this size its older half is dropped.
+MAX_DELTA_BYTES = 8 * 1024 * 1024
+
+
+def record_key(record):
+    """Stable identity of a listing: internalPid + site_name (link for hand-made entries)."""
+    pid = record.get('internalPid')
+    if pid is not None:
+        return f"{pid}|{record.get('site_name') or ''}"
+    return record.get('link') or record.get('name') or ''
+
+
+def record_hash(record):
+    """Content hash of a record; key order doesn't matter."""
+    raw = json.dumps(record, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    """Last full state: {'seq', 'hashes': {key: hash}, 'records': {key: record}}."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        if isinstance(snapshot, dict) and 'records' in snapshot:
+            return snapshot
+    except (OSError, ValueError):
+        pass
+    return {'seq': 0, 'hashes': {}, 'records': {}}
+
+
+def snapshot_seq(path=SNAPSHOT_PATH):
+    """Sequence number of a snapshot without parsing it ('seq' is the first key written); 0 if none."""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(64)
+    except OSError:
+        return 0
+    m = _SEQ.search(head)
+    return int(m.group(1)) if m else 0
+
+
+def diff_records(snapshot, records):
+    """
+    Compare this scrape with the snapshot.
+    Returns (delta, hashes) where delta holds added / changed records and removed keys.
+    """
+    old_hashes = snapshot.get('hashes', {})
+    current = {}
+    for record in records:
+        current[record_key(record)] = record  # later sections (deals) win on duplicates
+
+    hashes = {}
+    added, changed = [], []
+    for key, record in current.items():
+        h = record_hash(record)
+        hashes[key] = h
+        old = old_hashes.get(key)
+        if old is None:
+            added.append(record)
+        elif old != h:
+            changed.append(record)
+    removed = [key for key in old_hashes if key not in current]
+    return {'added': added, 'changed': changed, 'removed': removed}, hashes
+
+
+def write_incremental(records, snapshot_path=SNAPSHOT_PATH, delta_path=DELTA_PATH, max_delta_bytes=MAX_DELTA_BYTES):
+    """
+    Diff records against the previous snapshot. If anything changed, append one
+    compact JSON line to the delta log and replace the snapshot; otherwise write nothing.
+    The log is compacted once it outgrows max_delta_bytes (None: never).
+    Returns the delta (with its 'seq' number).
+    """
+    snapshot = load_snapshot(snapshot_path)
+    delta, hashes = diff_records(snapshot, records)
+    if not (delta['added'] or delta['changed'] or delta['removed']):
+        delta['seq'] = snapshot.get('seq', 0)
+        return delta
+
+    seq = snapshot.get('seq', 0) + 1
+    delta = {'seq': seq, 'ts': int(time.time()), **delta}
+    # Delta first: readers that see the new snapshot can skip deltas up to its seq
+    with open(delta_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(delta, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+    records_by_key = {record_key(r): r for r in records}
+    tmp_path = snapshot_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'seq': seq, 'hashes': hashes, 'records': records_by_key}, f,
+                  ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, snapshot_path)
+    if max_delta_bytes and os.path.getsize(delta_path) > max_delta_bytes:
+        compact_deltas(delta_path, max_delta_bytes // 2)
+    return delta
+
+
+def compact_deltas(delta_path=DELTA_PATH, keep_bytes=MAX_DELTA_BYTES // 2):
+    """
+    Keep only the newest deltas (up to keep_bytes) in a new file swapped in with
+    os.replace(). Everything dropped is already in the snapshot: a reader sees a new
+    file, starts over from its top, and rebuilds from the snapshot if it was further behind.
+    """
+    with open(delta_path, 'rb') as f:
+        lines = f.read().splitlines(keepends=True)
+    kept = []
+    size = 0
+    for line in reversed(lines):
+        if kept and size + len(line) > keep_bytes:
+            break
+        kept.append(line)
+        size += len(line)
+    tmp_path = delta_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.writelines(reversed(kept))
+    os.replace(tmp_path, delta_path)
+
+
+def read_deltas(delta_path=DELTA_PATH, offset=0, after_seq=0):
+    """
+    Read complete delta lines appended after byte `offset`, skipping (unparsed)
+    those with seq <= after_seq.
+    Returns (deltas, new_offset); a half-written last line is left for next time.
+    """
+    try:
+        with open(delta_path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+    except OSError:
+        return [], offset
+    end = data.rfind(b'\n') + 1
+    deltas = []
+    for line in data[:end].splitlines():
+        if line.strip():
+            # 'seq' is the first key written, so already-applied deltas cost a regex, not a parse
+            m = _SEQ.search(line, 0, 32)
+            if m and int(m.group(1)) <= after_seq:
+                continue
+            try:
+                deltas.append(json.loads(line))
+            except ValueError:
+                continue
+    return deltas, offset + end
@@ -0,0 +1,281 @@
+import json
+import re
+
+from metrics import timer
+
+# Sections parse_html.py has always pulled out of the SvelteKit page data
+SECTION_KEYS = ['trendingProducts', 'exclusiveDealsProducts', 'features', 'supportedStoresFeatureInfo', 'referral']
+
+_DATA_KEY = re.compile(r'\bdata\s*:\s*\[')
+# One token per match() call, leading whitespace and separating comma included. String patterns are
+# unrolled ("[^"\\]*(?:\\.[^"\\]*)*") so they run in linear time with no backtracking.
+_TOKEN = re.compile(r"""\s*,?\s*(?:
+    (?P<punct>[{}\[\],:()])
+  | (?P<dq>"[^"\\]*(?:\\.[^"\\]*)*")
+  | (?P<num>-?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<ident>[A-Za-z_$][\w$]*)
+  | (?P<sq>'[^'\\]*(?:\\.[^'\\]*)*')
+)""", re.VERBOSE | re.DOTALL)
+# An object key together with its comma and colon, so each key costs one match() call
+_KEY = re.compile(r"""\s*,?\s*(?:
+    (?P<ident>[A-Za-z_$][\w$]*|-?\d+(?:\.\d*)?)
+  | (?P<dq>"[^"\\]*(?:\\.[^"\\]*)*")
+  | (?P<sq>'[^'\\]*(?:\\.[^'\\]*)*')
+)\s*:""", re.VERBOSE | re.DOTALL)
+_JS_HEX_ESCAPE = re.compile(r'\\x([0-9a-fA-F]{2})')
+_JS_ESCAPE = re.compile(r'\\(u[0-9a-fA-F]{4}|.)', re.DOTALL)
+_JS_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v', '0': '\0'}
+
+_CONSTANTS = {'true': True, 'false': False, 'null': None, 'undefined': None,
+              'NaN': float('nan'), 'Infinity': float('inf')}
+
+
+class JSLiteralError(ValueError):
+    """The JS object literal could not be parsed at `pos`."""
+
+    def __init__(self, message, pos):
+        super().__init__(f"{message} at offset {pos}")
+        self.pos = pos
+
+
+class JSLiteralParser:
+    """
+    One-pass parser for JavaScript object/array literals as SvelteKit serializes
+    them: unquoted keys, single or double quoted strings, trailing commas,
+    undefined / void 0, new Date("...").
+    Works directly on the page string from a start offset with an explicit
+    container stack; no copies, no JSON rewriting, no recursion per nesting level.
+    """
+
+    def __init__(self, text):
+        self.text = text
+
+    def parse(self, pos=0):
+        """Parse one value starting at pos; returns (value, end_offset)."""
+        text = self.text
+        match = _TOKEN.match
+        containers = []  # open dicts / lists
+        keys = []        # per container: pending dict key (None = expecting a key)
+
+        match_key = _KEY.match
+        expecting_key = False
+
+        while True:
+            if expecting_key:
+                k = match_key(text, pos)
+                if k is not None:
+                    kind = k.lastgroup
+                    keys[-1] = k.group(kind) if kind == 'ident' else _decode_string(k.group(kind))
+                    pos = k.end()
+                    expecting_key = False
+                    continue
+            m = match(text, pos)
+            if m is None:
+                raise JSLiteralError("Unexpected input" if pos < len(text) else "Unexpected end of input", pos)
+            kind = m.lastgroup
+            token = m.group(kind)
+            pos = m.end()
+            top = containers[-1] if containers else None
+
+            if kind == 'punct':
+                if token == ',':
+                    continue
+                if token == '{' or token == '[':
+                    if expecting_key:
+                        raise JSLiteralError("Expected object key", m.start(kind))
+                    containers.append({} if token == '{' else [])
+                    keys.append(None)
+                    expecting_key = token == '{'
+                    continue
+                if token == '}' or token == ']':
+                    if top is None or (token == '}') != (type(top) is dict) or not (expecting_key or type(top) is list):
+                        raise JSLiteralError(f"Unexpected {token!r}", m.start(kind))
+                    value = containers.pop()
+                    keys.pop()
+                    expecting_key = False
+                else:
+                    raise JSLiteralError(f"Unexpected {token!r}", m.start(kind))
+            elif expecting_key:
+                raise JSLiteralError("Expected ':'", pos)
+            elif kind == 'dq' or kind == 'sq':
+                value = _decode_string(token)
+            elif kind == 'num':
+                value = float(token) if ('.' in token or 'e' in token or 'E' in token) else int(token)
+            elif token in _CONSTANTS:
+                value = _CONSTANTS[token]
+            elif token == 'void':
+                # void 0 -> undefined
+                _, pos = self.parse(pos)
+                value = None
+            elif token == 'new':
+                value, pos = self._constructor(pos)
+            else:
+                # Bare identifier used as a value: keep its name, as the old regex cleanup did
+                value = token
+
+            # A complete value: attach it to its parent or finish
+            if not containers:
+                return value, pos
+            top = containers[-1]
+            if type(top) is list:
+                top.append(value)
+            else:
+                top[keys[-1]] = value
+                keys[-1] = None
+                expecting_key = True
+
+    def _constructor(self, pos):
+        # new Date("...") / new Set([...]) -> first constructor argument
+        text = self.text
+        name = _TOKEN.match(text, pos)
+        if name is None or name.lastgroup != 'ident':
+            raise JSLiteralError("Expected constructor name", pos)
+        paren = _TOKEN.match(text, name.end())
+        if paren is None or paren.group('punct') != '(':
+            return None, name.end()
+        pos = paren.end()
+        value = None
+        close = _TOKEN.match(text, pos)
+        if close is None or close.group('punct') != ')':
+            value, pos = self.parse(pos)
+            close = _TOKEN.match(text, pos)
+        if close is None or close.group('punct') != ')':
+            raise JSLiteralError("Expected ')'", pos)
+        return value, close.end()
+
+
+def _decode_string(token):
+    raw = token[1:-1]
+    if '\\' in raw:
+        raw = _unescape(raw, token[0])
+    return raw
+
+
+def _unescape(raw, quote):
+    if quote == "'":
+        raw = raw.replace("\\'", "'").replace('"', '\\"')
+    raw = _JS_HEX_ESCAPE.sub(r'\\u00\1', raw)
+    try:
+        # strict=False: raw tabs/newlines inside the string are fine in JS
+        return json.loads('"' + raw + '"', strict=False)
+    except ValueError:
+        # An escape JSON doesn't know (\v, \0, \a ...): decode them one by one like JS does
+        return _JS_ESCAPE.sub(_js_escape, raw)
+
+
+def _js_escape(m):
+    escape = m.group(1)
+    if len(escape) == 5:
+        return chr(int(escape[1:], 16))
+    return _JS_ESCAPES.get(escape, escape)
+
+
+def find_kit_data(html_str):
+    """
+    Locate the `data: [` array passed to SvelteKit's kit.start(...).
+    Plain substring scans, no DOM. Returns the offset of '[' or -1.
+    """
+    start = html_str.find('kit.start(')
+    if start < 0:
+        return -1
+    node_ids = html_str.find('node_ids', start)
+    m = _DATA_KEY.search(html_str, node_ids if node_ids >= 0 else start)
+    if not m:
+        return -1
+    return m.end() - 1
+
+
+def extract_kit_data(html_str):
+    """Return the parsed kit.start data array, or None if the page has none."""
+    with timer('locate'):
+        pos = find_kit_data(html_str)
+    if pos < 0:
+        return None
+    with timer('parse'):
+        data, _ = JSLiteralParser(html_str).parse(pos)
+    return data
+
+
+def pick_sections(parsed_data):
+    """Collect the known sections from every node's `data` object."""
+    extracted = {}
+    for item in parsed_data or []:
+        if isinstance(item, dict) and isinstance(item.get('data'), dict):
+            sub_data = item['data']
+            for key in SECTION_KEYS:
+                if key in sub_data:
+                    extracted[key] = sub_data[key]
+    return extracted
+
+
+# --- BENCHMARK ---
+def _legacy_parse(html_str):
+    # The BeautifulSoup + regex rewriting path parse_html.py used before this module
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html_str, 'lxml')
+    script_content = html_str
+    for script in soup.find_all('script'):
+        script_text = script.string or ''
+        if script_text and re.search(r'sveltekit.*kit\.start.*node_ids.*data:\s*\[', script_text, re.DOTALL | re.IGNORECASE):
+            script_content = script_text
+            break
+    data_match = re.search(r'data:\s*(\[[\s\S]*?)\]\s*,\s*form:', script_content, re.DOTALL)
+    if not data_match:
+        return None
+    data_str = data_match.group(1).strip()
+    data_str = re.sub(r'([a-zA-Z_$][a-zA-Z0-9_$]*)\s*:', r'"\1":', data_str)
+    data_str = re.sub(r':\s*([a-zA-Z_$][a-zA-Z0-9_$]*)(?=\s*[,}\]]|$)', r': "\1"', data_str)
+    data_str = re.sub(r',\s*([}\]])', r'\1', data_str)
+    data_str = re.sub(r',\s*(?=[}\]])', '', data_str)
+    data_str = re.sub(r'\\n|\\t', ' ', data_str)
+    data_str = re.sub(r'\s*,\s*,\s*', ',', data_str)
+    if not data_str.startswith('['):
+        data_str = '[' + data_str + ']'
+    try:
+        return json.loads(data_str.rstrip(','))
+    except ValueError:
+        return None
+
+
+def _inflate_page(html_str, copies):
+    # Repeat the trendingProducts records to build a multi-megabyte page
+    data = extract_kit_data(html_str)
+    products = pick_sections(data).get('trendingProducts') or []
+    start = html_str.find('trendingProducts:[', find_kit_data(html_str)) + len('trendingProducts:[')
+    end = html_str.find('],exclusiveDealsProducts', start)
+    body = html_str[start:end]
+    return html_str[:start] + ','.join([body] * copies) + html_str[end:], len(products) * copies
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+    import time
+    import tracemalloc
+
+    # Usage: python svelte_extract.py [saved_page.html] [copies]
+    here = os.path.dirname(os.path.abspath(__file__))
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(here, 'fixtures', 'buyhatke_home.html')
+    copies = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    with open(path, 'r', encoding='utf-8') as f:
+        page, records = _inflate_page(f.read(), copies)
+    print(f"Page: {len(page) / 1e6:.1f} MB, ~{records:,} trending records")
+
+    runs = [('streaming parser', lambda: pick_sections(extract_kit_data(page)))]
+    try:
+        import bs4  # noqa: F401  (only needed to compare against the old path)
+        runs.append(('soup + regex (old)', lambda: _legacy_parse(page)))
+    except ImportError:
+        print("beautifulsoup4/lxml not installed: skipping the old-path comparison")
+
+    for label, run in runs:
+        # Time without tracing (tracemalloc slows allocation-heavy code), then measure peak
+        start = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        status = 'parsed' if result else 'FAILED (JSON rewrite broke the payload)'
+        print(f"{label:20} {elapsed * 1000:9.1f} ms  peak {peak / 1e6:8.1f} MB  {status}")
@@ -0,0 +1,34 @@
+import subprocess
+import sys
+
+import alerts
+from alerts import AlertEngine, AlertRules
+
+ALERTS_SCRIPT = alerts.__file__
+LISTING = {'internalPid': 71000000, 'site_name': 'Amazon', 'name': 'Apple iPhone 15', 'cur_price': 47999,
+           'last_price': 79900, 'price_drop_per': 40}
+
+
+def test_rules_added_by_another_process_are_matched(tmp_path):
+    db = str(tmp_path / 'alerts.db')
+    engine = AlertEngine(AlertRules(db))
+    assert engine.evaluate([LISTING]) == []
+
+    # What the README tells users to run while the daemon is up
+    subprocess.run([sys.executable, ALERTS_SCRIPT, '--db', db, 'add', '71000000', '--below', '50000'],
+                   check=True, capture_output=True)
+    alerts = engine.evaluate([LISTING])
+    assert [(a['internalPid'], a['kind'], a['threshold']) for a in alerts] == [(71000000, 'below', 50000)]
+
+    rule_id = alerts[0]['rule_id']
+    subprocess.run([sys.executable, ALERTS_SCRIPT, '--db', db, 'remove', str(rule_id)], check=True,
+                   capture_output=True)
+    assert engine.evaluate([dict(LISTING, cur_price=45999)]) == []
+
+
+def test_own_changes_rebuild_the_index(tmp_path):
+    rules = AlertRules(str(tmp_path / 'alerts.db'))
+    engine = AlertEngine(rules)
+    assert engine.evaluate([LISTING]) == []
+    rules.add(71000000, min_drop_per=30)
+    assert len(engine.evaluate([LISTING])) == 1
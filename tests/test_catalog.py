@@ -0,0 +1,96 @@
+import json
+import os
+
+from catalog import CatalogCache
+from snapshot_diff import write_incremental
+
+SITES = ('Amazon', 'Flipkart')
+
+
+def _listing(i, price):
+    return {'name': f"ACME PHONE X{i} (Black, 128 GB)", 'cur_price': price, 'last_price': 99999,
+            'price_drop_per': 10, 'rating': 4.0, 'ratingCount': 100, 'site_name': SITES[i % 2],
+            'internalPid': 5000 + i, 'link': f"https://example.com/{i}"}
+
+
+def _catalog(tmp_path):
+    products = tmp_path / 'products.json'
+    products.write_text(json.dumps([{'name': 'HANDMADE LAPTOP', 'cur_price': 30000, 'link': 'x'}]))
+    return CatalogCache(str(products), delta_path=str(tmp_path / 'delta.jsonl'),
+                        snapshot_path=str(tmp_path / 'snapshot.json'))
+
+
+def test_many_repricing_deltas_keep_search_correct(tmp_path):
+    catalog = _catalog(tmp_path)
+    listings = [_listing(i, 10000 + i) for i in range(100)]
+    write_incremental(listings, catalog.snapshot_path, catalog.delta_path)
+    assert len(catalog.get_products()) == 101
+
+    # 250 deltas (2.5x the catalog), each repricing 50 listings: the search
+    # index compacts several times along the way
+    for step in range(250):
+        for i in range(step % 2, 100, 2):
+            listings[i] = _listing(i, 20000 + step * 10 + i)
+        write_incremental(listings, catalog.snapshot_path, catalog.delta_path)
+        catalog.get_products()
+
+    assert catalog.stats['errors'] == 0
+    assert catalog.stats['deltas_applied'] == 250  # the first scrape came in with the snapshot
+    assert len(catalog.get_products()) == 101
+    total, results = catalog.search('acme phone')
+    assert total == 100
+    assert {p['cur_price'] for p in results} == {p['cur_price'] for p in listings}
+    total, groups = catalog.search_grouped('x42')
+    assert total == 1 and groups[0][0]['cur_price'] == listings[42]['cur_price']
+    total, groups = catalog.search_grouped('acme', limit=3, sort='cur_price')
+    assert total == 100
+    assert [offers[0]['cur_price'] for offers in groups] == sorted(p['cur_price'] for p in listings)[:3]
+    assert catalog.search('handmade')[0] == 1
+
+
+
+def test_grouped_relevance_pages(tmp_path):
+    catalog = _catalog(tmp_path)
+    write_incremental([_listing(i, 10000 + i) for i in range(60)], catalog.snapshot_path, catalog.delta_path)
+
+    total, everything = catalog.search_grouped('acme phone')
+    assert total == len(everything) == 60
+    for offset in (0, 12, 55):
+        total, page = catalog.search_grouped('acme phone', limit=12, offset=offset)
+        assert total == 60 and page == everything[offset:offset + 12]
+    total, page = catalog.search_grouped('acme phone', limit=5, max_price=10009)
+    assert total == 10 and page == [g for g in everything if g[0]['cur_price'] <= 10009][:5]
+
+def test_delta_log_ahead_of_missing_snapshot(tmp_path):
+    catalog = _catalog(tmp_path)
+    # The log starts at seq 5 and there is no snapshot to rebuild from
+    with open(catalog.delta_path, 'w', encoding='utf-8') as f:
+        for seq in (5, 6):
+            f.write(json.dumps({'seq': seq, 'added': [_listing(seq, 1000 * seq)], 'changed': [], 'removed': []}) + '\n')
+
+    assert len(catalog.get_products()) == 3
+    assert catalog.stats['errors'] == 0
+    assert catalog.search('acme')[0] == 2
+
+
+def test_compacted_delta_log(tmp_path):
+    follower = _catalog(tmp_path)
+    lagging = _catalog(tmp_path)
+    catalog = follower
+    listings = [_listing(i, 10000 + i) for i in range(20)]
+    write_incremental(listings, catalog.snapshot_path, catalog.delta_path, max_delta_bytes=4096)
+    follower.get_products()
+    lagging.get_products()
+
+    for step in range(200):
+        listings[step % 20] = _listing(step % 20, 20000 + step)
+        write_incremental(listings, catalog.snapshot_path, catalog.delta_path, max_delta_bytes=4096)
+        follower.get_products()
+
+    # The log stays small; a reader that kept up and one that fell far behind both end up current
+    assert os.path.getsize(catalog.delta_path) <= 4096
+    for reader in (follower, lagging):
+        assert reader.stats['errors'] == 0
+        total, results = reader.search('acme phone')
+        assert total == 20
+        assert sorted(p['cur_price'] for p in results) == sorted(p['cur_price'] for p in listings)
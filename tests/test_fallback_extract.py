@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from fallback_extract import FEATURE_KEYS, _corpus, extract_records
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures')
+PAGES = _corpus(FIXTURES)
+# file -> (trending, deals) records the fallback must find
+EXPECTED = {
+    'buyhatke_home.html': (12, 6),
+    'buyhatke_home_state_global.html': (12, 6),
+    'buyhatke_deals_only.html': (0, 6),
+}
+FEATURES = {'spendButtonClicked': 218, 'GraphClicked': 1432, 'AutoCouponClicked': 877, 'DittoOpened': 95,
+            'WatchPriceClicked': 3120, 'CompareBarNewHovered': 64}
+
+
+@pytest.fixture
+def timed(request):
+    """pytest-benchmark's `benchmark` when installed, otherwise a plain call."""
+    if request.config.pluginmanager.hasplugin('benchmark'):
+        return request.getfixturevalue('benchmark')
+    return lambda fn, *args: fn(*args)
+
+
+def test_every_fixture_is_covered():
+    assert sorted(PAGES) == sorted(EXPECTED)
+
+
+@pytest.mark.parametrize('name', sorted(EXPECTED))
+def test_counts(name, timed):
+    result = timed(extract_records, PAGES[name])
+    trending, deals = EXPECTED[name]
+    assert len(result['trendingProducts']) == trending
+    assert len(result['exclusiveDealsProducts']) == deals
+    assert result['features'] == FEATURES
+    assert set(result['features']) == set(FEATURE_KEYS)
+
+
+def test_trending_fields():
+    first = extract_records(PAGES['buyhatke_home.html'])['trendingProducts'][0]
+    assert first['name'] == 'Apple iPhone 15 (Black, 128 GB)'
+    assert first['cur_price'] == 47999 and first['last_price'] == 79900 and first['price_drop_per'] == 40
+    assert first['site_name'] == 'Amazon' and first['site_pos'] == 63
+    assert first['internalPid'] == 71000000
+    assert first['rating'] == 4.5 and first['ratingCount'] == 19822
+    assert 'score' not in first
+
+
+def test_deal_fields():
+    deals = extract_records(PAGES['buyhatke_deals_only.html'])['exclusiveDealsProducts']
+    # rating -1 means "no rating yet"
+    assert deals[0]['rating'] is None
+    assert deals[0]['score'] == 16 and deals[0]['ratingCount'] == 52043
+    assert deals[-1]['name'] == 'Google Pixel 8a (Obsidian, 128 GB)'
+    assert deals[-1]['site_name'] == 'Flipkart' and deals[-1]['rating'] == 4.3 and deals[-1]['score'] == 84
+
+
+def test_large_page(timed):
+    # The scale the benchmark in fallback_extract.py runs at; counts grow linearly
+    result = timed(extract_records, PAGES['buyhatke_home.html'] * 200)
+    assert len(result['trendingProducts']) == 12 * 200
+    assert len(result['exclusiveDealsProducts']) == 6 * 200
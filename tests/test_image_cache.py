@@ -0,0 +1,69 @@
+import io
+import os
+import time
+
+from PIL import Image
+
+import image_cache
+from image_cache import ThumbnailCache
+
+
+class _Response:
+    def __init__(self, data):
+        self.headers = {'Content-Length': str(len(data))}
+        self._data = data
+
+    def iter_content(self, size):
+        return [self._data[i:i + size] for i in range(0, len(self._data), size)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Fetcher:
+    workers = 4
+
+    def __init__(self):
+        out = io.BytesIO()
+        Image.new('RGB', (800, 600), (200, 30, 30)).save(out, 'JPEG')
+        self.image = out.getvalue()
+
+    def get(self, url, **kwargs):
+        return _Response(self.image)
+
+
+def _wait(cache):
+    deadline = time.time() + 10
+    while cache._queued and time.time() < deadline:
+        time.sleep(0.01)
+    cache._background.shutdown(wait=True)
+    cache._background = None
+
+
+def test_index_writes_are_batched(tmp_path, monkeypatch):
+    writes = []
+    real_replace = os.replace
+    monkeypatch.setattr(image_cache.os, 'replace', lambda src, dst: (writes.append(dst), real_replace(src, dst)))
+    cache = ThumbnailCache(str(tmp_path), fetcher=_Fetcher())
+    urls = [f"https://img.example.com/{i}.jpg" for i in range(12)]
+
+    assert set(cache.ready(urls).values()) == {None}
+    _wait(cache)
+    index_writes = [w for w in writes if w.endswith('index.json')]
+    assert 1 <= len(index_writes) < len(urls)  # one write once the page is built, not one per image
+    assert len(ThumbnailCache(str(tmp_path))._index) == 12
+
+    # Reruns that only hit the cache don't rewrite index.json...
+    del writes[:]
+    for _ in range(50):
+        assert None not in cache.ready(urls).values()
+    assert cache._background is None and not writes
+
+    # ...until FLUSH_INTERVAL has passed, and then from the background
+    monkeypatch.setattr(cache, '_flushed_at', time.monotonic() - image_cache.FLUSH_INTERVAL)
+    cache.ready(urls)
+    _wait(cache)
+    assert [w for w in writes if w.endswith('index.json')] == [cache._index_path]
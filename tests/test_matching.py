@@ -0,0 +1,75 @@
+import json
+import os
+
+from matching import ProductMatcher, block_key, cluster_listings, normalize_title
+
+PRODUCTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'products.json')
+
+BOOK4_CORE5 = ("Samsung Galaxy Book4 (Silver, 16GB RAM, 512GB SSD) | 15.6 Full HD Screen | Intel Core 5 120U "
+               "Processor | Windows 11 | MS Office | Thin & Light Laptop | NP750XGJ-KG1IN")
+BOOK4_I5 = ("Samsung Galaxy Book4 15.6\" Full HD Screen | Intel Core i5 1335U Processor | 16GB RAM | 512GB SSD | "
+            "Windows 11 | MS Office | Thin & Light Laptop | NP750XFG-KB3IN")
+
+# (title, store) pairs labelled by hand: same product or not
+SAME = [
+    (("Apple iPhone 15 (Black, 128 GB)", 'Flipkart'), ("Apple iPhone 15 (128 GB) - Black", 'Amazon')),
+    (("SAMSUNG S235G AI SMARTPHONE", 'Amazon'), ("Samsung Galaxy S23 5G", 'Flipkart')),
+    (("REDMI NOTE 11 Pro", 'Flipkart'), ("Xiaomi Redmi Note 11 Pro", 'Amazon')),
+]
+DIFFERENT = [
+    ((BOOK4_CORE5, 'Amazon'), (BOOK4_I5, 'Amazon')),
+    (("Amazon Basics True Wireless in-Ear Earbuds with Mic (Black)", 'Amazon'),
+     ("Amazon Basics Truly Wireless Earbuds with ENC and Mic", 'Amazon')),
+    (("SAMSUNG S23 FE", 'Flipkart'), ("SAMSUNG S23 ULTRA", 'Amazon')),
+    (("SAMSUNG GALAXY S24", 'Flipkart'), ("SAMSUNG GALAXY S24+", 'Amazon')),
+]
+
+
+def _anchor(name):
+    return block_key(normalize_title(name))[2]
+
+
+def test_anchor_is_the_first_model_number():
+    assert _anchor("boAt Enigma X500 Smartwatch with 1.43 AMOLED Round Display") == 'x500'
+    assert _anchor(BOOK4_CORE5) == _anchor(BOOK4_I5) == 'book4'
+    assert _anchor("Samsung Galaxy Watch8 (40mm, Bluetooth, Graphite) with 3nm Processor") == 'watch8'
+    assert _anchor("Apple 2025 MacBook Air (13-inch, Apple M4 chip, 16GB Unified Memory, 256GB)") != '2025'
+
+
+def test_labelled_pairs():
+    for expected, pairs in ((True, SAME), (False, DIFFERENT)):
+        for (a, site_a), (b, site_b) in pairs:
+            matcher = ProductMatcher()
+            same = matcher.add('a', a, site_a) == matcher.add('b', b, site_b)
+            assert same == expected, (a, b)
+
+
+def test_one_listing_per_store_in_a_group():
+    with open(PRODUCTS, 'r', encoding='utf-8') as f:
+        products = json.load(f)
+    for offers in cluster_listings(products):
+        sites = [p['site_name'] for p in offers]
+        assert len(sites) == len(set(sites)), [p['name'] for p in offers]
+
+
+def test_remove_frees_the_store_slot():
+    matcher = ProductMatcher()
+    group = matcher.add('f1', "APPLE iPhone 15 (Black, 128 GB)", 'Flipkart')
+    assert matcher.add('a1', "Apple iPhone 15 (Black, 128 GB)", 'Amazon') == group
+    assert matcher.add('a2', "Apple iPhone 15 (Blue, 128 GB)", 'Amazon') != group
+    # Re-adding a listing (a repricing) keeps its place
+    assert matcher.add('a1', "Apple iPhone 15 (Black, 128 GB)", 'Amazon') == group
+    matcher.remove('a1')
+    assert matcher.add('a3', "Apple iPhone 15 (128 GB) - Black", 'Amazon') == group
+
+
+def test_colours_split_groups():
+    matcher = ProductMatcher()
+    black = matcher.add('f1', "APPLE iPhone 15 (Black, 128 GB)", 'Flipkart')
+    assert matcher.add('a1', "Apple iPhone 15 (128 GB) - Pink", 'Amazon') != black
+    assert matcher.add('c1', "Apple iPhone 15 128GB Black", 'Croma') == black
+    # A title without a colour still joins a group
+    assert matcher.add('r1', "Apple iPhone 15 128GB", 'Reliance') in (black, matcher.group_of('a1'))
+    # Two-word colours only need one word in common
+    midnight = matcher.add('f2', "APPLE iPhone 15 (Midnight Black, 256 GB)", 'Flipkart')
+    assert matcher.add('a2', "Apple iPhone 15 (256 GB) - Black", 'Amazon') == midnight
@@ -0,0 +1,26 @@
+import json
+
+import pytest
+
+from metrics import Metrics
+
+
+def _reject(constant):
+    raise AssertionError(f"{constant} is not valid JSON")
+
+
+def test_slow_stages_export_valid_json():
+    metrics = Metrics()
+    for seconds in (0.002, 12.5, 31.0):
+        metrics.observe('catalog_load', seconds)
+    stage = json.loads(metrics.to_json(), parse_constant=_reject)['stages']['catalog_load']
+    # Above the last bucket bound: reported as the slowest observation
+    assert stage['p50_ms'] == stage['p95_ms'] == 31000.0
+    assert 'le="+Inf"} 3' in metrics.to_prometheus()
+
+
+def test_quantiles_stay_within_observed_range():
+    metrics = Metrics()
+    metrics.observe('search', 0.0031)
+    stage = metrics.snapshot()['stages']['search']
+    assert stage['p50_ms'] == pytest.approx(3.1) and stage['p95_ms'] == pytest.approx(3.1)
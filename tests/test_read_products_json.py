@@ -0,0 +1,46 @@
+import io
+import json
+
+from read_products_json import batch_cheapest, summarize_file
+
+
+def _write(path, data):
+    path.write_text(json.dumps(data), encoding='utf-8')
+    return str(path)
+
+
+def test_odd_fields_are_skipped_not_fatal(tmp_path):
+    name = _write(tmp_path / 'odd.json', {'results': [
+        {'title': ['not', 'a', 'string'], 'store': {'name': 'Amazon'}, 'price': 100},
+        {'title': 42, 'name': 'Phone X', 'store': 'Flipkart', 'price': 90},
+        {'title': 'Phone Y', 'store': 'Croma', 'price': True},
+        'not an item',
+    ]})
+    summary = summarize_file(name)
+    assert summary['error'] is None
+    assert summary['cheapest']['title'] == 'Phone X' and summary['cheapest']['price'] == 90
+    assert set(summary['stores']) == {'Unknown Store', 'Flipkart'}
+    assert summarize_file(_write(tmp_path / 'bad.json', {'results': 7}))['error']
+
+
+def test_batch_reports_each_file(tmp_path):
+    good = _write(tmp_path / 'a.json', {'cheapest': {'title': 'Phone X', 'store': 'Amazon', 'price': 100},
+                                        'results': [{'title': 'Phone X', 'store': 'Flipkart', 'price': 95}]})
+    scraped = _write(tmp_path / 'b.json', {'trendingProducts': [
+        {'name': 'Phone X', 'site_name': 'Croma', 'cur_price': 120},
+        {'name': {'en': 'Phone Z'}, 'site_name': ['Amazon'], 'cur_price': 10}]})
+    empty = _write(tmp_path / 'c.json', {'results': [{'title': 'Phone Y', 'store': 'Croma'}]})
+    (tmp_path / 'd.json').write_text('{not json', encoding='utf-8')
+
+    out = io.StringIO()
+    failed = batch_cheapest([str(tmp_path)], out, workers=2)
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+
+    files = {line['file']: line for line in lines if line['type'] == 'file'}
+    assert set(files) == {good, scraped, empty, str(tmp_path / 'd.json')}
+    assert failed == 2 and files[empty]['error'] and files[str(tmp_path / 'd.json')]['error']
+    assert files[good]['cheapest']['price'] == 95
+    products = {line['title']: line['price'] for line in lines if line['type'] == 'product'}
+    assert products == {'Phone X': 95, 'Unknown Product': 10}
+    stores = {line['store']: line['price'] for line in lines if line['type'] == 'store'}
+    assert stores == {'Amazon': 100, 'Flipkart': 95, 'Croma': 120, 'Unknown Store': 10}
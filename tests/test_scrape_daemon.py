@@ -0,0 +1,118 @@
+import os
+import threading
+
+import pytest
+
+import scrape_daemon
+from fetcher import serve_fixtures
+from http_cache import HttpCache
+from scrape_daemon import FakeClock, JobStore, ScrapeDaemon
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures')
+
+
+@pytest.fixture
+def site():
+    server, base = serve_fixtures(FIXTURES)
+    yield base
+    server.shutdown()
+
+
+def _daemon(tmp_path, base, **kwargs):
+    store = JobStore(str(tmp_path / 'jobs.json'))
+    store.add(f"{base}/buyhatke_home.html", interval=600)
+    return ScrapeDaemon(store, workers=2, clock=FakeClock(start=1_700_000_000),
+                        cache=HttpCache(str(tmp_path / 'http_cache')),
+                        history_path=str(tmp_path / 'history.db'),
+                        snapshot_path=str(tmp_path / 'snapshot.json'),
+                        delta_path=str(tmp_path / 'delta.jsonl'), seed=1, **kwargs)
+
+
+def test_failed_persist_is_retried_despite_304(tmp_path, site, monkeypatch):
+    calls = []
+    write_incremental = scrape_daemon.write_incremental
+
+    def flaky_write(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("disk full")
+        return write_incremental(*args, **kwargs)
+
+    monkeypatch.setattr(scrape_daemon, 'write_incremental', flaky_write)
+    daemon = _daemon(tmp_path, site)
+    daemon.run(duration=3 * 3600)
+
+    # The page never changes: the retry gets a 304 and must still persist the cached body
+    assert daemon.stats['persisted'] == 1
+    assert daemon.stats['not_modified'] >= 10
+    assert os.path.exists(daemon.snapshot_path)
+
+
+def test_failing_hook_does_not_stall_the_pipeline(tmp_path, site):
+    def on_persist(delta, listings):
+        raise OSError("alerts.jsonl is read-only")
+
+    daemon = _daemon(tmp_path, site, on_persist=on_persist)
+    daemon.jobs.add(f"{site}/buyhatke_deals_only.html", interval=600)
+    runner = threading.Thread(target=daemon.run_once, daemon=True)
+    runner.start()
+    runner.join(30)
+
+    assert not runner.is_alive()
+    assert daemon.stats['persisted'] == 2 and daemon.stats['hook_errors'] == 2
+    assert all('on_persist failed' in job.last_status for job in daemon.jobs.jobs.values())
+
+
+def test_jobs_added_while_running_are_kept_and_run(tmp_path, site):
+    jobs_path = str(tmp_path / 'jobs.json')
+    added = f"{site}/buyhatke_deals_only.html"
+
+    def on_persist(delta, listings):
+        # Another process runs `scrape_daemon.py --add` while the daemon works
+        if not os.path.exists(jobs_path) or added not in open(jobs_path, encoding='utf-8').read():
+            assert scrape_daemon.main(['--jobs', jobs_path, '--add', added, '--interval', '900']) == 0
+
+    daemon = _daemon(tmp_path, site, on_persist=on_persist)
+    daemon.jobs.save()
+    daemon.run(duration=3600)
+
+    assert daemon.jobs.jobs[added].interval == 900
+    assert daemon.jobs.jobs[added].last_run is not None
+    assert set(JobStore(jobs_path).jobs) == {f"{site}/buyhatke_home.html", added}
+
+
+def test_job_file_edits_merge(tmp_path):
+    path = str(tmp_path / 'jobs.json')
+    daemon_store = JobStore(path)
+    daemon_store.add('https://a.example', interval=600)
+    daemon_store.add('https://b.example', interval=600)
+    daemon_store.save()
+
+    cli = JobStore(path)
+    cli.remove('https://a.example')
+    cli.add('https://b.example', interval=60)
+    cli.add('https://c.example', interval=120)
+    cli.save()
+
+    daemon_store.jobs['https://b.example'].failures = 3  # run state the file doesn't have yet
+    daemon_store.save()
+    merged = JobStore(path).jobs
+    assert set(merged) == {'https://b.example', 'https://c.example'}
+    assert merged['https://b.example'].interval == 60 and merged['https://b.example'].failures == 3
+
+
+def test_cache_write_error_fails_the_job_not_the_thread(tmp_path, site, monkeypatch):
+    daemon = _daemon(tmp_path, site)
+    daemon.jobs.add(f"{site}/buyhatke_deals_only.html", interval=600)
+
+    def store(*args, **kwargs):
+        raise OSError("no space left on device")
+
+    monkeypatch.setattr(daemon.cache, 'store', store)
+    runner = threading.Thread(target=daemon.run_once, daemon=True)
+    runner.start()
+    runner.join(30)
+
+    assert not runner.is_alive()
+    assert daemon.stats['fetch_errors'] == 2 and daemon.stats['persisted'] == 0
+    assert all(job.failures == 1 and 'no space left' in job.last_status for job in daemon.jobs.jobs.values())
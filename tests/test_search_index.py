@@ -0,0 +1,41 @@
+from search_index import SearchIndex
+
+
+def test_doc_ids_survive_compaction():
+    index = SearchIndex({'name': f"PHONE {i}", 'cur_price': 1000 + i} for i in range(1500))
+    keep = index.add({'name': 'SAMSUNG S23 ULTRA', 'cur_price': 90000})
+    # Reprice every phone twice: compaction runs once stale ids outnumber live ones
+    ids = list(range(1500))
+    for _ in range(2):
+        ids = [index.update(d, {'name': f"PHONE {i}", 'cur_price': 2000 + i}) for i, d in enumerate(ids)]
+
+    assert len(index) == 1501
+    assert index.get(keep)['name'] == 'SAMSUNG S23 ULTRA'
+    assert index.search('s23 ultra') == [index.get(keep)]
+    assert [index.get(d)['cur_price'] for d in ids[:3]] == [2000, 2001, 2002]
+    total, ranked = index.search_ids('phone 7')
+    assert total == 111 and index.get(ranked[0])['name'] == 'PHONE 7'  # 7, 70-79, 700-799
+
+
+def test_repricing_reuses_slots():
+    index = SearchIndex({'name': f"PHONE {i}", 'cur_price': 1000 + i} for i in range(1500))
+    ids = list(range(1500))
+    for step in range(20):
+        ids = [index.update(d, {'name': f"PHONE {i}", 'cur_price': 5000 + step}) for i, d in enumerate(ids)]
+
+    # 30k updates: removed slots are recycled after compaction instead of piling up
+    assert len(index.documents()) < 1500 * 3
+    assert len(index) == 1500 and len(set(ids)) == 1500
+    assert all(index.get(d)['cur_price'] == 5019 for d in ids)
+    total, ranked = index.search_ids('phone 42')
+    assert index.get(ranked[0])['name'] == 'PHONE 42' and index.get(ranked[0])['cur_price'] == 5019
+    assert total == 11  # 42, 420-429
+
+
+def test_iter_ranked_matches_search_ids():
+    index = SearchIndex({'name': f"PHONE {i} PRO" if i % 3 else f"PHONE {i}", 'cur_price': 1000 + i % 50}
+                        for i in range(500))
+    _, ranked = index.search_ids('phone 1')
+    assert list(index.iter_ranked('phone 1')) == ranked
+    subset = ranked[::2]
+    assert list(index.iter_ranked('phone 1', subset)) == [d for d in ranked if d in set(subset)]
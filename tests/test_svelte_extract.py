@@ -0,0 +1,77 @@
+import math
+import os
+
+import pytest
+
+from svelte_extract import JSLiteralError, JSLiteralParser, extract_kit_data, find_kit_data, pick_sections
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures')
+
+
+def parse(text):
+    value, end = JSLiteralParser(text).parse()
+    return value
+
+
+def test_keys_quoted_and_unquoted():
+    assert parse('{a:1,"b c":2,\'d\':3,$e_1:4,5:6}') == {'a': 1, 'b c': 2, 'd': 3, '$e_1': 4, '5': 6}
+
+
+def test_strings_in_both_quotes():
+    assert parse('["it\\"s", \'it\\\'s\', \'say "hi"\', "\\u20b9\\x41"]') == ['it"s', "it's", 'say "hi"', '₹A']
+
+
+def test_control_characters_and_js_escapes():
+    # A raw tab inside the string must not corrupt the escapes around it
+    assert parse('"a\\tb\tc"') == 'a\tb\tc'
+    assert parse("'x\\vy\\0z\\n'") == 'x\x0by\x00z\n'
+
+
+def test_trailing_commas():
+    assert parse('{a:[1,2,],b:{c:3,},}') == {'a': [1, 2], 'b': {'c': 3}}
+
+
+def test_constants_void_and_constructors():
+    value = parse('{a:void 0,b:undefined,c:null,d:true,e:false,f:new Date("2025-10-10"),g:new Set([1,2]),'
+                  'h:NaN,i:-1.5e2,j:bare}')
+    assert value['a'] is None and value['b'] is None and value['c'] is None
+    assert value['d'] is True and value['e'] is False
+    assert value['f'] == '2025-10-10' and value['g'] == [1, 2]
+    assert math.isnan(value['h']) and value['i'] == -150.0 and value['j'] == 'bare'
+
+
+def test_parse_stops_at_the_end_of_the_value():
+    text = 'x = {a:[1]}; rest'
+    value, end = JSLiteralParser(text).parse(4)
+    assert value == {'a': [1]} and text[end:] == '; rest'
+
+
+@pytest.mark.parametrize('text, pos', [
+    ('{a:1', 4),      # unterminated object
+    ('{a:1]', 4),     # mismatched bracket
+    ('{a 1}', 2),     # missing colon
+    ('[1,?]', 3),     # unexpected character
+])
+def test_errors_report_the_offset(text, pos):
+    with pytest.raises(JSLiteralError) as error:
+        parse(text)
+    assert error.value.pos == pos
+    assert f"offset {pos}" in str(error.value)
+
+
+def test_fixture_page():
+    with open(os.path.join(FIXTURES, 'buyhatke_home.html'), 'r', encoding='utf-8') as f:
+        page = f.read()
+    assert find_kit_data(page) > 0
+    sections = pick_sections(extract_kit_data(page))
+    assert len(sections['trendingProducts']) == 12
+    assert len(sections['exclusiveDealsProducts']) == 6
+    first = sections['trendingProducts'][0]
+    assert first['name'] == 'Apple iPhone 15 (Black, 128 GB)'
+    assert first['cur_price'] == 47999 and first['site_name'] == 'Amazon'
+    assert sections['features']['WatchPriceClicked'] == 3120
+
+
+def test_page_without_kit_data():
+    assert find_kit_data('<html><script>var x = {data: [1]}</script></html>') == -1
+    assert extract_kit_data('<html></html>') is None